@@ -0,0 +1,177 @@
+# Two-tier semantic answer cache in front of the RAG query path.
+# Support traffic repeats the same questions with small wording changes, and every one of them costs a retrieval
+# plus an LLM call. AnswerCache answers them from memory instead:
+#   1. exact tier    - normalized question text ("What is AI?" == "what is ai")
+#   2. semantic tier - cosine nearest neighbour over the embeddings of earlier questions, accepted when the
+#                      similarity is >= threshold; the embedding is the one the query path computes anyway
+# Entries expire after ttl seconds, the least recently used entries are evicted beyond max_entries, and every
+# entry is tied to the index version it was answered from: when the index changes (new ingest, new collection
+# contents) the whole cache is dropped. stats() reports hits per tier, misses and the hit rate.
+# Install dependencies if not already installed: pip install numpy
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from embedding_cache import normalize_text as normalize_whitespace
+
+
+# --- 1. Question Keys and Index Versions ---
+def normalize_question(question):
+    # Case, whitespace and trailing punctuation do not change the question
+    return re.sub(r"[\s?!.]+$", "", normalize_whitespace(question).casefold())
+
+
+def index_version(index_dir, names=("index.faiss", "manifest.json", "index_params.json")):
+    # Changes whenever ingestion rewrites the saved index (size and mtime of its files)
+    digest = hashlib.sha1()
+    for name in names:
+        path = os.path.join(index_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def ingest_counter(counter_path, name):
+    # Version of a store that has no saved index files (e.g. a Chroma collection): the number of ingests recorded
+    # with bump_ingest_counter. Unlike the item count it changes on upserts and updates of the same size.
+    if not os.path.exists(counter_path):
+        return f"{name}:0"
+    with open(counter_path, "r") as file:
+        return f"{name}:{json.load(file).get(name, 0)}"
+
+
+def bump_ingest_counter(counter_path, name):
+    # Call after every write to the store; returns the new version
+    counters = {}
+    if os.path.exists(counter_path):
+        with open(counter_path, "r") as file:
+            counters = json.load(file)
+    counters[name] = counters.get(name, 0) + 1
+    tmp_path = counter_path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(counters, file)
+    os.replace(tmp_path, counter_path)
+    return f"{name}:{counters[name]}"
+
+
+# --- 2. Answer Cache ---
+class AnswerCache:
+    def __init__(self, threshold=0.95, ttl=3600, max_entries=10_000, version=None):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = version
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # normalized question -> entry dict, least recently used first
+        # Semantic tier: one unit-length row per entry with a vector, slots are reused after eviction
+        self.matrix = None
+        self.slot_keys = [None] * max_entries
+        self.occupied = np.zeros(max_entries, dtype=bool)
+        self.free_slots = list(range(max_entries - 1, -1, -1))
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "expired": 0, "evicted": 0,
+                         "invalidations": 0}
+
+    def set_version(self, version):
+        # Drops every entry when the index the answers came from has changed
+        with self.lock:
+            if version != self.version:
+                if self.entries:
+                    self.counters["invalidations"] += 1
+                self._clear()
+                self.version = version
+
+    def _clear(self):
+        self.entries.clear()
+        self.slot_keys = [None] * self.max_entries
+        self.occupied[:] = False
+        self.free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        if entry["slot"] is not None:
+            self.slot_keys[entry["slot"]] = None
+            self.occupied[entry["slot"]] = False
+            self.free_slots.append(entry["slot"])
+
+    def _is_expired(self, entry, now):
+        return self.ttl is not None and now - entry["created"] > self.ttl
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _nearest(self, vector):
+        # (key, similarity) of the most similar cached question, or (None, -1.0)
+        if self.matrix is None or not self.occupied.any():
+            return None, -1.0
+        similarities = self.matrix @ self._unit(vector)
+        similarities[~self.occupied] = -np.inf
+        slot = int(np.argmax(similarities))
+        return self.slot_keys[slot], float(similarities[slot])
+
+    def lookup(self, question, vector=None):
+        # Returns (tier, value) with tier "exact" or "semantic", or (None, None) on a miss
+        key = normalize_question(question)
+        now = time.time()
+        with self.lock:
+            tier = "exact"
+            if key not in self.entries and vector is not None:
+                key, similarity = self._nearest(vector)
+                tier = "semantic" if similarity >= self.threshold else None
+            entry = self.entries.get(key) if tier else None
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(key)
+                self.counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None, None
+            self.entries.move_to_end(key)
+            entry["hits"] += 1
+            self.counters[f"{tier}_hits"] += 1
+            return tier, entry["value"]
+
+    def store(self, question, value, vector=None):
+        key = normalize_question(question)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            while len(self.entries) >= self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.counters["evicted"] += 1
+            slot = None
+            if vector is not None:
+                unit = self._unit(vector)
+                if self.matrix is None:
+                    self.matrix = np.zeros((self.max_entries, len(unit)), dtype=np.float32)
+                slot = self.free_slots.pop()
+                self.matrix[slot] = unit
+                self.slot_keys[slot] = key
+                self.occupied[slot] = True
+            self.entries[key] = {"value": value, "created": time.time(), "slot": slot, "hits": 0}
+
+    def stats(self):
+        counters = self.counters
+        hits = counters["exact_hits"] + counters["semantic_hits"]
+        total = hits + counters["misses"]
+        return {**counters, "entries": len(self.entries), "hit_rate": hits / total if total else 0.0}
+
+
+def cached_answer(cache, question, vector, answer_fn):
+    # Looks the question up in both tiers; on a miss calls answer_fn() and caches its result
+    tier, value = cache.lookup(question, vector)
+    if tier is not None:
+        return value
+    value = answer_fn()
+    cache.store(question, value, vector)
+    return value
@@ -0,0 +1,132 @@
+# Metadata-filtered search with a pre-built attribute index.
+# "Search only within these 50 PDFs" used to mean over-fetching from the whole index and post-filtering in Python:
+# slow, and it silently returns fewer than k results when the PDFs are a small slice of the corpus. AttributeIndex
+# maps every source to the sorted vector positions of its chunks (CSR: order + offsets, built with one argsort
+# over the per-position source codes in columns/source.npy, see faiss_mmap_store.py), so the subset is known
+# before any distance is computed:
+#   - flat indexes: the subset's vectors are sliced out of the index and searched exactly, the cost depends on
+#     the subset size only, not on the corpus size
+#   - every other kind: faiss searches with an IDSelector (hash set for small subsets, bitmap for large ones), so
+#     vectors outside the subset are never scored or returned
+# Chroma applies the same kind of pre-filter itself: collection.query(where={"source": {"$in": [...]}}).
+# Install dependencies if not already installed: pip install faiss-cpu numpy
+
+import json
+import math
+import os
+
+import faiss
+import numpy as np
+
+from faiss_mmap_store import COLUMNS_DIR
+
+MAX_EF_SEARCH = 4096
+
+
+# --- 1. Source -> Vector Positions ---
+class AttributeIndex:
+    def __init__(self, values, codes):
+        # values: distinct source values; codes: int array, the code of every vector position
+        codes = np.asarray(codes)
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+        self.ntotal = len(codes)
+        self.order = np.argsort(codes, kind="stable").astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.values)))])
+
+    @classmethod
+    def load(cls, index_dir):
+        # From the columnar side files that save_index writes next to index.faiss
+        directory = os.path.join(index_dir, COLUMNS_DIR)
+        with open(os.path.join(directory, "sources.json"), "r") as file:
+            values = json.load(file)
+        return cls(values, np.load(os.path.join(directory, "source.npy"), mmap_mode="r"))
+
+    @classmethod
+    def from_vector_store(cls, vector_store, key="source"):
+        # For a store that is only in memory; positions are those of vector_store.index
+        codes = {}
+        docstore = vector_store.docstore
+        column = np.fromiter(
+            (
+                codes.setdefault(docstore.search(vector_store.index_to_docstore_id[i]).metadata.get(key), len(codes))
+                for i in range(vector_store.index.ntotal)
+            ),
+            dtype=np.int32,
+            count=vector_store.index.ntotal,
+        )
+        return cls(list(codes), column)
+
+    def positions(self, sources):
+        # Sorted vector positions of all chunks of the given sources; unknown sources match nothing
+        slices = [
+            self.order[self.offsets[code]:self.offsets[code + 1]]
+            for code in (self.codes.get(source) for source in sources)
+            if code is not None
+        ]
+        return np.sort(np.concatenate(slices)) if slices else np.zeros(0, dtype=np.int64)
+
+    def selector(self, positions):
+        # Small subsets: hash set of IDs; large subsets: a bitmap of ntotal bits (1/8 byte per vector)
+        if len(positions) * 64 < self.ntotal:
+            return faiss.IDSelectorBatch(positions)
+        bitmap = np.zeros(self.ntotal, dtype=bool)
+        bitmap[positions] = True
+        return faiss.IDSelectorBitmap(np.packbits(bitmap, bitorder="little"))
+
+
+# --- 2. Pre-Filtered Search ---
+def search_parameters(index, selector, selectivity=1.0, nprobe=None, ef_search=None):
+    # Approximate indexes see fewer matching candidates when the subset is small (IVF probes lists that hold
+    # few of its vectors, HNSW walks past them), so nprobe / efSearch grow with sqrt(1 / selectivity).
+    # Skipping a non-matching vector is a bitmap or hash lookup, not a distance computation.
+    boost = math.sqrt(1 / max(selectivity, 1e-9))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        nprobe = nprobe or min(ivf.nlist, math.ceil(ivf.nprobe * boost))
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        ef_search = ef_search or min(MAX_EF_SEARCH, math.ceil(hnsw.efSearch * boost))
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    return faiss.SearchParameters(sel=selector)
+
+
+def filtered_positions(index, attribute_index, query_vectors, k, sources, nprobe=None):
+    # (distances, positions) like index.search, restricted to the chunks of sources
+    query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+    positions = attribute_index.positions(sources)
+    if len(positions) == 0:
+        empty = np.full((len(query_vectors), k), -1, dtype=np.int64)
+        return np.full(empty.shape, np.inf, dtype=np.float32), empty
+
+    flat = faiss.downcast_index(index)
+    if isinstance(flat, faiss.IndexFlat):
+        vectors = faiss.rev_swig_ptr(flat.get_xb(), flat.ntotal * flat.d).reshape(flat.ntotal, flat.d)
+        subset_k = min(k, len(positions))
+        distances, local = faiss.knn(query_vectors, vectors[positions], subset_k, metric=flat.metric_type)
+        found = np.where(local >= 0, positions[np.maximum(local, 0)], -1)
+        if found.shape[1] < k:  # fewer chunks than k in the subset
+            pad = k - found.shape[1]
+            found = np.pad(found, ((0, 0), (0, pad)), constant_values=-1)
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+        return distances, found
+
+    selector = attribute_index.selector(positions)
+    params = search_parameters(index, selector, len(positions) / attribute_index.ntotal, nprobe)
+    return index.search(query_vectors, k, params=params)
+
+
+def filtered_search(vector_store, attribute_index, query, k=3, sources=(), nprobe=None):
+    # similarity_search(query, k) over the chunks of the given sources only; works with FAISS.load_local stores
+    # and with faiss_mmap_store.load_mmap_store (positions are resolved through index_to_docstore_id)
+    embed = vector_store.embedding_function
+    vector = np.asarray([embed.embed_query(query) if hasattr(embed, "embed_query") else embed(query)], dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        faiss.normalize_L2(vector)
+    _, positions = filtered_positions(vector_store.index, attribute_index, vector, k, sources, nprobe)
+    return [
+        vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+        for position in positions[0]
+        if position != -1
+    ]
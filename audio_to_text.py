@@ -1,22 +1,23 @@
 # Example 1: Podcast Transcription with Timestamps
 # Scenario: You want to transcribe a 30-second clip from an English podcast and generate subtitles with timestamps.
 
-from transformers import pipeline
+from transcription_service import load_asr_pipeline
+from transcription_cache import cached_transcribe, open_transcription_cache
 import torch
 
-# Initialize Whisper pipeline (use GPU if available)
+# Initialize Whisper pipeline (use GPU if available); loaded once per process and shared by the examples below
 device = "cuda" if torch.cuda.is_available() else "cpu"
-pipe = pipeline(
-    "automatic-speech-recognition",
-    model="openai/whisper-large-v3",
-    device=device
-)
+pipe = load_asr_pipeline("openai/whisper-large-v3", device)
+# Results are cached by audio content, model and generate_kwargs: a rerun on the same clip returns instantly
+cache = open_transcription_cache("transcription_cache.sqlite")
 
 # Load audio file (e.g., WAV, MP3)
 audio = "podcast_clip.wav"
 
 # Transcribe with timestamps
-result = pipe(
+result = cached_transcribe(
+    cache,
+    pipe,
     audio,
     generate_kwargs={
         "task": "transcribe",
@@ -44,22 +45,22 @@ print("Timestamps:", result["chunks"])
 
 
 
-from transformers import pipeline
+from transcription_service import load_asr_pipeline
+from transcription_cache import cached_transcribe, open_transcription_cache
 import torch
 
-# Initialize Whisper pipeline
+# Initialize Whisper pipeline (the cached one from Example 1, not a second copy of the weights)
 device = "cuda" if torch.cuda.is_available() else "cpu"
-pipe = pipeline(
-    "automatic-speech-recognition",
-    model="openai/whisper-large-v3",
-    device=device
-)
+pipe = load_asr_pipeline("openai/whisper-large-v3", device)
+cache = open_transcription_cache("transcription_cache.sqlite")
 
 # Load audio file
 audio = "spanish_interview.wav"
 
-# Translate to English
-result = pipe(
+# Translate to English (task is part of the cache key: the transcription of the same file is a separate entry)
+result = cached_transcribe(
+    cache,
+    pipe,
     audio,
     generate_kwargs={
         "task": "translate",
@@ -76,26 +77,110 @@ print("Translation:", result["text"])
 # Example 3: Integration with Langfuse for Monitoring
 # Scenario: You’re building a voice-to-text customer support system and want to monitor Whisper’s performance using Langfuse.
 
-from transformers import pipeline
-from langfuse import get_client
+from transcription_service import load_asr_pipeline
+from trace_exporter import LangfuseSender, TraceExporter
 import torch
 
-# Initialize Langfuse and Whisper
-langfuse = get_client()
-device = "cuda" if torch.cuda.is_available() else "cpu"
-pipe = pipeline("automatic-speech-recognition", model="openai/whisper-large-v3", device=device)
-
-# Process audio
+# Initialize the Langfuse exporter: traces are queued and sent in batches by a background thread, so the
+# transcription never waits for Langfuse (see trace_exporter.py). LangfuseSender reads LANGFUSE_HOST,
+# LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY; overflow="spill" keeps traces on disk while Langfuse is unreachable.
+exporter = TraceExporter(LangfuseSender(), batch_size=100, flush_interval=1.0, overflow="spill")
 audio = "customer_call.wav"
-result = pipe(audio, generate_kwargs={"task": "transcribe", "language": "english"})
 
-# Log to Langfuse
-langfuse.trace(
-    name="customer_support_transcription",
+# Process audio, with a timing span per stage
+with exporter.start_trace(
+    "customer_support_transcription",
     input=audio,
-    output=result["text"],
     metadata={"model": "whisper-large-v3", "language": "english"}
-)
+) as trace:
+    with trace.span("load"):
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        pipe = load_asr_pipeline("openai/whisper-large-v3", device)
+    with trace.span("inference"):
+        result = pipe(audio, generate_kwargs={"task": "transcribe", "language": "english"})
+    with trace.span("postprocess"):
+        text = result["text"].strip()
+    trace.output = text
 
 # Output
+print("Transcription:", text)
+print("Exporter:", exporter.stats)  # exported / batches / dropped / spilled; flushed at exit
+
+#=======================================
+#=======================================
+
+# Example 4: Long-Form Transcription of an Hour-Long Call on CPU
+# Scenario: Calls are an hour long; passing the whole file to the pipeline holds the entire waveform in memory and
+# transcribes one segment at a time. Stream the file in overlapping 30-second windows, batch them through the model
+# and get timestamps relative to the start of the call (see long_audio_transcriber.py).
+
+from transcription_service import load_asr_pipeline
+from long_audio_transcriber import benchmark_rtf, transcribe_file
+
+pipe = load_asr_pipeline("openai/whisper-large-v3", "cpu")
+
+result = transcribe_file(
+    pipe,
+    "customer_call.wav",
+    window_s=30.0,  # Whisper's input length
+    overlap_s=5.0,  # shared between consecutive windows, so words at the seams are not cut
+    batch_size=8,
+    generate_kwargs={"task": "transcribe", "language": "english"}
+)
+print("Transcription:", result["text"])
+print("Timestamps:", result["chunks"][:5])
+
+# Real-time factor (processing seconds per audio second) for several batch sizes on the first 5 minutes
+benchmark_rtf(pipe, "customer_call.wav", batch_sizes=(1, 2, 4, 8), max_seconds=300,
+              generate_kwargs={"task": "transcribe", "language": "english"})
+
+#=======================================
+#=======================================
+
+# Example 5: Nightly Transcription of a Directory of Support Calls
+# Scenario: Thousands of calls land in support_calls/ every night. A pool of worker processes loads the model once
+# each, pulls call paths from a work queue and appends {"path", "text", "chunks", ...} lines to transcripts.jsonl as
+# calls finish. If the job is interrupted, running it again skips the calls already in the file
+# (see transcription_service.py).
+
+import subprocess
+import sys
+
+# Run as its own process: the workers are spawned, and spawned workers re-import the main script
+subprocess.run(
+    [sys.executable, "transcription_service.py", "support_calls", "transcripts.jsonl",
+     "--workers", "4", "--model", "openai/whisper-large-v3", "--language", "english"],
+    check=True
+)
+
+import json
+
+with open("transcripts.jsonl", "r", encoding="utf-8") as file:
+    records = [json.loads(line) for line in file]
+print("Transcribed:", sum("error" not in record for record in records), "calls")
+print("Failed:", [record["path"] for record in records if "error" in record])
+
+#=======================================
+#=======================================
+
+# Example 6: Skipping Silence and Hold Music Before Whisper
+# Scenario: Half of a support call is silence and hold music. A CPU voice-activity-detection pass finds the speech,
+# only the speech goes through the model, and the timestamps still refer to the original call
+# (see voice_activity.py). vad="webrtc" (pip install webrtcvad) also rejects most music; "energy" needs nothing extra.
+
+from transcription_service import load_asr_pipeline
+from voice_activity import transcribe_speech
+
+pipe = load_asr_pipeline("openai/whisper-large-v3", "cpu")
+
+result = transcribe_speech(
+    pipe,
+    "customer_call.wav",
+    batch_size=8,
+    generate_kwargs={"task": "transcribe", "language": "english"},
+    vad="energy",
+    min_silence_s=0.5,  # pauses shorter than this stay inside a speech segment
+)
 print("Transcription:", result["text"])
+print("Timestamps:", result["chunks"][:5])
+print(f"Transcribed {result['speech_seconds']}s of {result['duration']}s, skipped {result['skipped_seconds']}s")
@@ -0,0 +1,281 @@
+# Sparse lexical retrieval (BM25) next to the FAISS / Chroma vector stores, fused with dense results.
+# Dense-only retrieval misses exact terms (product names, error codes, acronyms) and needs a generous k to be
+# safe, which inflates the LLM context. BM25Index is built at ingest time and kept in step with the vector store
+# (same chunk IDs, add/delete by ID). It is a compact array-backed inverted index in CSR form:
+#   offsets[t]:offsets[t + 1]   postings of term t, sorted by document row
+#   docs, tfs                   document row (int32) and term frequency (uint16) of every posting
+#   doc_lengths                 tokens per document, for BM25 length normalization
+# New documents go to an append-only delta and deletes are tombstones; compact() merges both into the arrays
+# (vectorized, no per-posting Python objects), and save()/load() store the arrays as .npy files under bm25/.
+# Writes and compaction hold the index lock; search() only reads: it takes a snapshot of the compacted arrays
+# under the lock and scores outside it, so query threads can search concurrently.
+# reciprocal_rank_fusion() merges the lexical and dense rankings; hybrid_search() does both for a FAISS store.
+# Install dependencies if not already installed: pip install numpy
+
+import json
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+try:
+    from langchain.schema import BaseRetriever
+except ImportError:  # rag_app2.py uses the lexical index without LangChain
+    BaseRetriever = object
+
+LEXICAL_INDEX_DIR = "bm25"
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# --- 1. Array-Backed Inverted Index ---
+class BM25Index:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}  # term -> term id
+        self.keys = []  # document row -> chunk ID
+        self.rows = {}  # chunk ID -> document row
+        self.doc_lengths = array("i")
+        self.alive = bytearray()
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.docs = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        # Postings added since the last compact(), as parallel (term id, row, tf) arrays
+        self.delta_terms, self.delta_docs, self.delta_tfs = array("i"), array("i"), array("i")
+        self.deleted = 0
+        self.version = None  # version of the store the index mirrors, saved with it (e.g. an ingest counter)
+        self.length_norm = np.zeros(0, dtype=np.float32)  # BM25 length normalization per row, set by compact()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def add(self, keys, texts):
+        # Re-adding a known ID replaces its text. Tokenizing happens before taking the lock.
+        documents = [(key, Counter(tokenize(text))) for key, text in zip(keys, texts)]
+        with self.lock:
+            self._delete([key for key, _ in documents if key in self.rows])
+            for key, counts in documents:
+                row = len(self.keys)
+                self.keys.append(key)
+                self.rows[key] = row
+                self.doc_lengths.append(sum(counts.values()))
+                self.alive.append(1)
+                for term, tf in counts.items():
+                    self.delta_terms.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                    self.delta_docs.append(row)
+                    self.delta_tfs.append(min(tf, MAX_TF))
+
+    def delete(self, keys):
+        # Unknown IDs are ignored, like delete_chunks() in rag_ingest.py
+        keys = list(keys)
+        with self.lock:
+            self._delete(keys)
+
+    def _delete(self, keys):
+        for key in keys:
+            row = self.rows.pop(key, None)
+            if row is not None:
+                self.alive[row] = 0
+                self.deleted += 1
+
+    def compact(self):
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+        # Merges the delta into the CSR arrays and drops deleted rows; rows are renumbered densely. The arrays are
+        # replaced, never changed in place, so snapshots taken by search() stay valid. Called with the lock held.
+        if not self.delta_docs and not self.deleted and len(self.keys) == len(self.length_norm):
+            return
+        n_terms = len(self.vocabulary)
+        terms = np.concatenate([
+            np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets)),
+            np.frombuffer(self.delta_terms, dtype=np.int32).astype(np.int64),
+        ])
+        docs = np.concatenate([self.docs, np.frombuffer(self.delta_docs, dtype=np.int32)])
+        tfs = np.concatenate([self.tfs, np.frombuffer(self.delta_tfs, dtype=np.int32).astype(np.uint16)])
+
+        alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        new_rows = np.cumsum(alive, dtype=np.int64) - 1
+        keep = alive[docs]
+        terms, docs, tfs = terms[keep], new_rows[docs[keep]].astype(np.int32), tfs[keep]
+        order = np.lexsort((docs, terms))
+        self.docs, self.tfs = docs[order], tfs[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=n_terms))]).astype(np.int64)
+
+        self.keys = [key for key, is_alive in zip(self.keys, alive) if is_alive]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.doc_lengths = array("i", np.frombuffer(self.doc_lengths, dtype=np.int32)[alive].tobytes())
+        self.alive = bytearray(b"\x01" * len(self.keys))
+        self.delta_terms, self.delta_docs, self.delta_tfs = array("i"), array("i"), array("i")
+        self.deleted = 0
+        self._update_length_norm()
+
+    def _update_length_norm(self):
+        doc_lengths = np.frombuffer(bytes(self.doc_lengths), dtype=np.int32)
+        if len(doc_lengths) and doc_lengths.mean():
+            length_norm = self.k1 * (1 - self.b + self.b * doc_lengths / doc_lengths.mean())
+            self.length_norm = length_norm.astype(np.float32)
+        else:
+            self.length_norm = np.full(len(doc_lengths), self.k1, dtype=np.float32)
+
+    def search(self, query, k=10):
+        # Returns [(chunk ID, BM25 score)] for the k best matching documents
+        terms = tokenize(query)
+        with self.lock:
+            self._compact()  # only after writes; a no-op otherwise
+            keys, offsets, all_docs, all_tfs, length_norm = (
+                self.keys, self.offsets, self.docs, self.tfs, self.length_norm
+            )
+            term_ids = {self.vocabulary[term] for term in terms if term in self.vocabulary}
+        n_docs = len(length_norm)
+        if not n_docs or not term_ids:
+            return []
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = offsets[term_id], offsets[term_id + 1]
+            if start == end:
+                continue
+            docs, tfs = all_docs[start:end], all_tfs[start:end].astype(np.float32)
+            idf = np.log(1 + (n_docs - (end - start) + 0.5) / ((end - start) + 0.5))
+            scores += np.bincount(
+                docs, weights=idf * tfs * (self.k1 + 1) / (tfs + length_norm[docs]), minlength=n_docs
+            ).astype(np.float32)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(keys[row], float(scores[row])) for row in top]
+
+    # --- 2. Persistence ---
+    def save(self, directory):
+        with self.lock:
+            self._compact()
+            self._save(directory)
+
+    def _save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        np.save(os.path.join(directory, "docs.npy"), self.docs)
+        np.save(os.path.join(directory, "tfs.npy"), self.tfs)
+        np.save(os.path.join(directory, "doc_lengths.npy"), np.frombuffer(self.doc_lengths, dtype=np.int32))
+        with open(os.path.join(directory, "vocabulary.json"), "w") as file:
+            json.dump(list(self.vocabulary), file)
+        with open(os.path.join(directory, "index.json"), "w") as file:
+            json.dump({"k1": self.k1, "b": self.b, "keys": self.keys, "version": self.version}, file)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "index.json"), "r") as file:
+            meta = json.load(file)
+        index = cls(k1=meta["k1"], b=meta["b"])
+        with open(os.path.join(directory, "vocabulary.json"), "r") as file:
+            index.vocabulary = {term: term_id for term_id, term in enumerate(json.load(file))}
+        index.keys = meta["keys"]
+        index.rows = {key: row for row, key in enumerate(index.keys)}
+        index.offsets = np.load(os.path.join(directory, "offsets.npy"))
+        index.docs = np.load(os.path.join(directory, "docs.npy"))
+        index.tfs = np.load(os.path.join(directory, "tfs.npy"))
+        index.doc_lengths = array("i", np.load(os.path.join(directory, "doc_lengths.npy")).tobytes())
+        index.alive = bytearray(b"\x01" * len(index.keys))
+        index.version = meta.get("version")
+        index._update_length_norm()
+        return index
+
+    @classmethod
+    def from_vector_store(cls, vector_store, **kwargs):
+        # Builds the lexical index over every chunk of an existing FAISS store, keyed by its docstore IDs
+        index = cls(**kwargs)
+        keys = list(vector_store.index_to_docstore_id.values())
+        index.add(keys, (vector_store.docstore.search(key).page_content for key in keys))
+        index.compact()
+        return index
+
+    @classmethod
+    def from_collection(cls, collection, text_key="text", page_size=5000, **kwargs):
+        # Builds the lexical index over a Chroma collection whose texts are in metadata[text_key], page by page
+        index = cls(**kwargs)
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            index.add(page["ids"], (metadata[text_key] for metadata in page["metadatas"]))
+        index.compact()
+        return index
+
+
+def load_lexical_index(index_dir, vector_store=None):
+    # bm25/ inside a saved faiss_index; built from the store when an older index has none
+    directory = os.path.join(index_dir, LEXICAL_INDEX_DIR)
+    if os.path.exists(os.path.join(directory, "index.json")):
+        return BM25Index.load(directory)
+    if vector_store is not None:
+        return BM25Index.from_vector_store(vector_store)
+    return BM25Index()
+
+
+# --- 3. Reciprocal Rank Fusion ---
+def reciprocal_rank_fusion(rankings, k=60, weights=None):
+    # rankings: lists of IDs, best first. Score of an ID = sum of weight / (k + rank) over the rankings
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def dense_ids(vector_store, query, k):
+    # Docstore IDs of the k nearest chunks of a LangChain FAISS store (or of load_mmap_store())
+    embed = vector_store.embedding_function
+    vector = embed.embed_query(query) if hasattr(embed, "embed_query") else embed(query)
+    vector = np.asarray([vector], dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        vector /= np.linalg.norm(vector, axis=1, keepdims=True)
+    _, positions = vector_store.index.search(vector, k)
+    ids = [vector_store.index_to_docstore_id[position] for position in positions[0] if position != -1]
+    if hasattr(vector_store.docstore, "row_of"):  # memory-mapped store (faiss_mmap_store.py) is keyed by row
+        ids = [vector_store.docstore.docstore_id(row) for row in ids]
+    return ids
+
+
+def stored_document(vector_store, docstore_id):
+    docstore = vector_store.docstore
+    if hasattr(docstore, "row_of"):
+        return docstore.search(docstore.row_of(docstore_id))
+    return docstore.search(docstore_id)
+
+
+def hybrid_search(vector_store, lexical_index, query, k=3, fetch_k=20, rrf_k=60):
+    # Top fetch_k of each retriever, fused with RRF; chunks that rank well in both come first
+    fused = reciprocal_rank_fusion([
+        dense_ids(vector_store, query, fetch_k),
+        [key for key, _ in lexical_index.search(query, fetch_k)],
+    ], k=rrf_k)
+    return [stored_document(vector_store, key) for key, _ in fused[:k]]
+
+
+class HybridRetriever(BaseRetriever):
+    # Drop-in for vector_store.as_retriever(search_kwargs={"k": k}) in RetrievalQA
+    vector_store: object
+    lexical_index: object
+    k: int = 3
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return hybrid_search(self.vector_store, self.lexical_index, query, self.k, self.fetch_k, self.rrf_k)
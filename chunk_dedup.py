@@ -0,0 +1,213 @@
+# Near-duplicate chunk deduplication before embedding.
+# PDF corpora repeat headers, footers, boilerplate pages and whole files; every copy costs an embedding call,
+# index memory and retrieval noise (k=3 results that say the same thing). ChunkDeduplicator drops a chunk when
+#   1. its normalized text was already seen (exact SHA-1 match), or
+#   2. its MinHash signature over word shingles matches an earlier chunk with estimated Jaccard similarity
+#      >= threshold; candidates come from LSH banding, so each chunk is compared against a handful of others
+# and reports how many chunks, characters and (approximate) tokens were saved.
+# For incremental indexes the deduplicator remembers which dropped chunk duplicates which kept chunk: when a kept
+# chunk is deleted, forget() hands its duplicates back so they can be embedded in its place. save()/load_state()
+# persist all of that next to the index, so later runs do not have to rebuild it from the stored chunks.
+# Install dependencies if not already installed: pip install numpy
+
+import hashlib
+import pickle
+import re
+import zlib
+
+import numpy as np
+
+
+# --- 1. Normalization and Shingles ---
+def normalize_text(text):
+    # Case, punctuation and whitespace differences do not make a chunk new
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", text)).strip().lower()
+
+
+def shingle_hashes(text, shingle_size=3):
+    # 32-bit hashes of the word n-grams of the text; short texts become a single shingle
+    words = text.split(" ")
+    if len(words) <= shingle_size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+# --- 2. MinHash + LSH Deduplicator ---
+class ChunkDeduplicator:
+    def __init__(self, threshold=0.85, num_perm=64, bands=16, shingle_size=3, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed_value = seed
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: h(x) = ((a * x + b) mod 2^64) >> 32 with a random odd a; uint64 arithmetic
+        # wraps around, which is exactly the mod 2^64
+        self.a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+        self.exact = {}  # SHA-1 of normalized text -> slot
+        self.signatures = []  # one uint32 signature per slot (per kept chunk, forgotten ones included)
+        self.keys = []  # slot -> chunk key, None once the chunk was forgotten
+        self.digests = []  # slot -> SHA-1 of the normalized text
+        self.slot_of = {}  # chunk key -> slot of every kept chunk
+        self.buckets = [{} for _ in range(bands)]
+        self.duplicates = {}  # kept chunk key -> {duplicate key: payload}
+        self.canonical_of = {}  # duplicate key -> kept chunk key
+        self.stats = {"seen": 0, "kept": 0, "exact": 0, "near": 0, "chars_saved": 0}
+
+    def params(self):
+        return {
+            "threshold": self.threshold, "num_perm": self.num_perm, "bands": self.bands,
+            "shingle_size": self.shingle_size, "seed": self.seed_value,
+        }
+
+    def signature(self, normalized):
+        hashes = shingle_hashes(normalized, self.shingle_size)
+        with np.errstate(over="ignore"):
+            permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def check(self, text, key=None):
+        # Returns (None, key) for a new chunk (and remembers it under key, a running number by default),
+        # or ("exact" | "near", key of the earlier chunk) for a duplicate
+        normalized = normalize_text(text)
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        if digest in self.exact:
+            return "exact", self.keys[self.exact[digest]]
+
+        signature = self.signature(normalized)
+        band_keys = self._band_keys(signature)
+        candidates = set()
+        for bucket, band_key in zip(self.buckets, band_keys):
+            candidates.update(bucket.get(band_key, ()))
+        for candidate in sorted(candidates):
+            if np.mean(self.signatures[candidate] == signature) >= self.threshold:
+                return "near", self.keys[candidate]
+
+        slot = len(self.signatures)
+        key = slot if key is None else key
+        self.signatures.append(signature)
+        self.keys.append(key)
+        self.digests.append(digest)
+        self.slot_of[key] = slot
+        self.exact[digest] = slot
+        for bucket, band_key in zip(self.buckets, band_keys):
+            bucket.setdefault(band_key, []).append(slot)
+        return None, key
+
+    def seed(self, chunks):
+        # Register (key, text) pairs of chunks that are already in the index
+        for key, text in chunks:
+            self.check(text, key)
+
+    def classify(self, text, key=None):
+        # check() plus bookkeeping for report(); returns (kind, chunk key) like check()
+        self.stats["seen"] += 1
+        kind, chunk_key = self.check(text, key)
+        if kind is None:
+            self.stats["kept"] += 1
+        else:
+            self.stats[kind] += 1
+            self.stats["chars_saved"] += len(text)
+        return kind, chunk_key
+
+    def is_duplicate(self, text):
+        return self.classify(text)[0] is not None
+
+    def add_duplicate(self, key, canonical_key, payload=None):
+        # Records that the dropped chunk key is represented by the kept chunk canonical_key; payload (e.g. the
+        # Document) is handed back by forget() once the kept chunk goes away
+        self.duplicates.setdefault(canonical_key, {})[key] = payload
+        self.canonical_of[key] = canonical_key
+
+    def forget(self, keys):
+        # Removes kept chunks and recorded duplicates by key (their file changed or was removed).
+        # Returns (key, payload) pairs of the surviving duplicates of removed kept chunks: nothing represents
+        # them any more, so the caller checks them again and embeds the ones that are still new.
+        keys = set(keys)
+        for key in keys & self.canonical_of.keys():
+            canonical_key = self.canonical_of.pop(key)
+            del self.duplicates[canonical_key][key]
+            if not self.duplicates[canonical_key]:
+                del self.duplicates[canonical_key]
+        orphans = []
+        for key in keys & self.slot_of.keys():
+            slot = self.slot_of.pop(key)
+            self.keys[slot] = None
+            del self.exact[self.digests[slot]]
+            for bucket, band_key in zip(self.buckets, self._band_keys(self.signatures[slot])):
+                bucket[band_key].remove(slot)
+                if not bucket[band_key]:
+                    del bucket[band_key]
+            for duplicate_key, payload in self.duplicates.pop(key, {}).items():
+                del self.canonical_of[duplicate_key]
+                orphans.append((duplicate_key, payload))
+        return orphans
+
+    def save(self, path):
+        state = {
+            "params": self.params(),
+            "exact": self.exact,
+            "signatures": self.signatures,
+            "keys": self.keys,
+            "digests": self.digests,
+            "buckets": self.buckets,
+            "duplicates": self.duplicates,
+        }
+        with open(path, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_state(self, path):
+        # Restores what save() wrote; the MinHash parameters must match, otherwise the stored signatures
+        # mean nothing to this deduplicator
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        if state["params"] != self.params():
+            raise ValueError(f"{path} was written with {state['params']}, not {self.params()}")
+        self.exact = state["exact"]
+        self.signatures = state["signatures"]
+        self.keys = state["keys"]
+        self.digests = state["digests"]
+        self.slot_of = {key: slot for slot, key in enumerate(self.keys) if key is not None}
+        self.buckets = state["buckets"]
+        self.duplicates = state["duplicates"]
+        self.canonical_of = {
+            duplicate_key: canonical_key
+            for canonical_key, duplicates in self.duplicates.items()
+            for duplicate_key in duplicates
+        }
+
+    def filter_documents(self, documents, collapse=False):
+        # Keeps the first occurrence of every chunk. With collapse=True the kept chunk records where its
+        # duplicates came from in metadata["duplicates"] instead of losing that provenance.
+        kept = []
+        kept_by_key = {}
+        for document in documents:
+            kind, chunk_key = self.classify(document.page_content)
+            if kind is None:
+                kept.append(document)
+                kept_by_key[chunk_key] = document
+            elif collapse and chunk_key in kept_by_key:
+                kept_by_key[chunk_key].metadata.setdefault("duplicates", []).append(
+                    {key: document.metadata[key] for key in ("source", "page") if key in document.metadata}
+                )
+        return kept
+
+    def report(self):
+        stats = self.stats
+        removed = stats["exact"] + stats["near"]
+        share = removed / stats["seen"] if stats["seen"] else 0.0
+        return (
+            f"Dedup: {stats['seen']} chunks in, {stats['kept']} kept, {removed} dropped ({share:.1%}: "
+            f"{stats['exact']} exact, {stats['near']} near-duplicate), "
+            f"~{stats['chars_saved']:,} characters / ~{stats['chars_saved'] // 4:,} tokens not embedded"
+        )
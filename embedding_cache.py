@@ -0,0 +1,179 @@
+# Persistent, content-addressed embedding cache shared by rag_app.py, rag_app2.py and rag_bulk_pdf.py.
+# Vectors are stored in a SQLite file keyed by (model name, SHA-256 of the normalized text), so a chunk that was
+# embedded once - in any run, by any of the scripts - never reaches the embedding model again.
+# The cache is bounded by a maximum number of entries and evicts the least recently used vectors first.
+# SQLite and array are part of the standard library; the LangChain wrapper needs: pip install langchain
+
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+from array import array
+
+try:
+    from langchain.embeddings.base import Embeddings
+except ImportError:  # rag_app2.py uses the cache without LangChain
+    Embeddings = object
+
+SQLITE_MAX_VARIABLES = 500  # Keys per IN (...) lookup, well below SQLite's limit on bound parameters
+
+
+# --- 1. Cache Keys ---
+def normalize_text(text):
+    # Unicode NFC, trimmed, runs of whitespace collapsed: "AI  is\nfun " and "AI is fun" share one vector
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model_name, text):
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def vector_bytes(vector):
+    if hasattr(vector, "astype"):  # numpy row
+        return vector.astype("float32", copy=False).tobytes()
+    return array("f", vector).tobytes()
+
+
+# --- 2. SQLite-Backed Cache with LRU Eviction ---
+class EmbeddingCache:
+    def __init__(self, path="embedding_cache.sqlite", max_entries=5_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # WAL lets several scripts read the cache while one of them writes to it
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model_name, texts):
+        # Returns a list aligned with texts: the cached vector (list of floats) or None on a miss
+        vectors = []
+        for blob in self.get_many_bytes(model_name, texts):
+            if blob is None:
+                vectors.append(None)
+                continue
+            vector = array("f")
+            vector.frombytes(blob)
+            vectors.append(vector.tolist())
+        return vectors
+
+    def get_many_bytes(self, model_name, texts):
+        # Same as get_many but returns the raw float32 bytes, e.g. for numpy.frombuffer without a list round-trip
+        keys = [cache_key(model_name, text) for text in texts]
+        found = {}
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            batch = keys[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            found.update(rows)
+
+        if found:
+            # Touch the hits so they move to the back of the eviction order
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+            )
+            self.connection.commit()
+
+        blobs = [found.get(key) for key in keys]
+        hits = sum(blob is not None for blob in blobs)
+        self.hits += hits
+        self.misses += len(blobs) - hits
+        return blobs
+
+    def put_many(self, model_name, texts, vectors):
+        # vectors may be lists of floats or rows of a numpy array
+        now = time.time()
+        rows = [
+            (cache_key(model_name, text), model_name, vector_bytes(vector), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        cursor = self.connection.executemany(
+            "INSERT OR IGNORE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)", rows
+        )
+        self.connection.commit()
+        self.entries += max(cursor.rowcount, 0)
+        if self.entries > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        # Other processes may have written in the meantime, so recount before deleting the least recently used
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self.entries - self.max_entries
+        if excess <= 0:
+            return
+        self.connection.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.connection.commit()
+        self.entries -= excess
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.entries,
+        }
+
+    def close(self):
+        self.connection.close()
+
+
+def embed_with_cache(cache, model_name, texts, embed_fn):
+    # Looks every text up in the cache and calls embed_fn(list_of_texts) -> list of vectors for the misses only.
+    # Duplicate texts within one call are embedded once.
+    vectors = cache.get_many(model_name, texts)
+    missing = {}
+    for i, (text, vector) in enumerate(zip(texts, vectors)):
+        if vector is None:
+            missing.setdefault(cache_key(model_name, text), []).append(i)
+    if not missing:
+        return vectors
+
+    positions = list(missing.values())
+    miss_texts = [texts[indices[0]] for indices in positions]
+    new_vectors = [list(map(float, vector)) for vector in embed_fn(miss_texts)]
+    cache.put_many(model_name, miss_texts, new_vectors)
+    for indices, vector in zip(positions, new_vectors):
+        for i in indices:
+            vectors[i] = vector
+    return vectors
+
+
+# --- 3. LangChain Wrapper ---
+class CachedEmbeddings(Embeddings):
+    # Drop-in replacement for any LangChain embeddings object (OpenAIEmbeddings, HuggingFaceEmbeddings, ...):
+    # FAISS.from_documents(docs, CachedEmbeddings(OpenAIEmbeddings(...), EmbeddingCache()))
+    def __init__(self, embeddings, cache, model_name=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = (
+            model_name
+            or getattr(embeddings, "model", None)
+            or getattr(embeddings, "model_name", None)
+            or type(embeddings).__name__
+        )
+
+    def embed_documents(self, texts):
+        return embed_with_cache(self.cache, self.model_name, list(texts), self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        # Some models embed queries differently from documents, so queries get their own key space
+        return embed_with_cache(
+            self.cache, f"{self.model_name}:query", [text], lambda batch: [self.embeddings.embed_query(batch[0])]
+        )[0]
@@ -0,0 +1,79 @@
+# One shared SentenceTransformer embedding service for Chroma collections.
+# Registering SentenceTransformerEmbeddingFunction on a collection loads a second copy of a model that the script
+# already holds for encoding chunks. This service loads each model once per process, acts as the collection's
+# embedding function, and batch-encodes inserts and queries straight into float32 NumPy arrays (no .tolist()
+# round-trips). Vectors go through the shared embedding cache (see embedding_cache.py) when one is given.
+# Install dependencies if not already installed: pip install chromadb sentence-transformers numpy
+
+from functools import lru_cache
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+
+# --- 1. Load Each Model Once ---
+@lru_cache(maxsize=None)
+def load_model(model_name, device=None):
+    return SentenceTransformer(model_name, device=device)
+
+
+# --- 2. Embedding Service ---
+class EmbeddingService:
+    # Also implements Chroma's EmbeddingFunction protocol (__call__(input) -> embeddings), so the same instance
+    # can be registered on the collection: get_or_create_collection(name, embedding_function=service)
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=256, cache=None, device=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache = cache
+        self.model = load_model(model_name, device)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def _encode(self, texts):
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+
+    def encode(self, texts):
+        # Returns a (len(texts), dimension) float32 array
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if self.cache is None:
+            return self._encode(texts)
+
+        blobs = self.cache.get_many_bytes(self.model_name, texts)
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        missing = [i for i, blob in enumerate(blobs) if blob is None]
+        for i, blob in enumerate(blobs):
+            if blob is not None:
+                vectors[i] = np.frombuffer(blob, dtype=np.float32)
+        if missing:
+            encoded = self._encode([texts[i] for i in missing])
+            vectors[missing] = encoded
+            self.cache.put_many(self.model_name, [texts[i] for i in missing], encoded)
+        return vectors
+
+    def __call__(self, input):
+        return self.encode(input)
+
+    def name(self):
+        # Newer Chroma versions persist the embedding function name with the collection
+        return f"embedding_service/{self.model_name}"
+
+
+# --- 3. Batched Collection Inserts ---
+def add_to_collection(collection, service, ids, texts, metadatas=None, add_batch_size=5000, max_batch_size=None):
+    # Encodes and upserts in large batches; max_batch_size is the client limit (chroma_client.get_max_batch_size()).
+    # Upsert, not add: collection.add ignores IDs that already exist, so a re-added chunk would keep its old text
+    if max_batch_size is not None:
+        add_batch_size = min(add_batch_size, max_batch_size)
+    for start in range(0, len(texts), add_batch_size):
+        end = start + add_batch_size
+        collection.upsert(
+            ids=ids[start:end],
+            embeddings=service.encode(texts[start:end]),
+            metadatas=metadatas[start:end] if metadatas is not None else None,
+        )
@@ -0,0 +1,210 @@
+# Configurable FAISS index types for the RAG vector store.
+# FAISS.from_documents builds an exact IndexFlatL2: search cost grows linearly with the corpus and memory is
+# 4 bytes x dim x N. This module swaps the store's index for an approximate one built with faiss.index_factory:
+#   "flat"     exact search, the baseline (IndexFlatL2)
+#   "sq8"      8-bit scalar quantization, 4x less memory, still exhaustive
+#   "hnsw"     HNSW graph, fastest queries, more memory than flat, no deletes
+#   "ivfsq8"   inverted lists + 8-bit codes, sub-linear search with good recall
+#   "ivfpq"    inverted lists + product quantization, ~dim/16 bytes per vector, for tens of millions of chunks
+#   "opqivfpq" ivfpq with an OPQ rotation learned first, better recall at the same code size
+# Quantizers are trained on a random sample of the stored vectors; the index spec, training size and search
+# parameters are persisted as index_params.json next to index.faiss. evaluate() measures recall@k and latency
+# of a candidate index against the exact flat index:
+#     python faiss_index_factory.py faiss_index ivfpq
+# Install dependencies if not already installed: pip install faiss-cpu numpy langchain
+
+import json
+import math
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+INDEX_PARAMS_NAME = "index_params.json"
+
+
+# --- 1. Index Specs ---
+def default_nlist(n_vectors):
+    # ~4 * sqrt(N) inverted lists, rounded to a power of two
+    return max(16, 2 ** round(math.log2(4 * math.sqrt(max(n_vectors, 1)))))
+
+
+def default_pq_m(dim, dims_per_subquantizer=16):
+    # Largest number of sub-quantizers that divides dim and gives at least dims_per_subquantizer dims each
+    for m in range(max(1, dim // dims_per_subquantizer), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def index_spec(kind, dim, n_vectors):
+    nlist = default_nlist(n_vectors)
+    m = default_pq_m(dim)
+    specs = {
+        "flat": "Flat",
+        "sq8": "SQ8",
+        "hnsw": "HNSW32",
+        "ivfsq8": f"IVF{nlist},SQ8",
+        "ivfpq": f"IVF{nlist},PQ{m}",
+        "opqivfpq": f"OPQ{m},IVF{nlist},PQ{m}",
+    }
+    if kind not in specs:
+        raise ValueError(f"Unknown index kind {kind!r}, expected one of {sorted(specs)}")
+    return specs[kind]
+
+
+def set_search_params(index, nprobe=32, ef_search=64):
+    # nprobe: inverted lists visited per query (IVF); efSearch: candidate list size (HNSW)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = ef_search
+
+
+# --- 2. Training on a Sample and Building ---
+def all_vectors(index):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return index.reconstruct_n(0, index.ntotal)
+    # IVF indexes can only reconstruct through a direct map, which would block remove_ids; drop it afterwards
+    ivf.make_direct_map()
+    vectors = index.reconstruct_n(0, index.ntotal)
+    ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    return vectors
+
+
+def build_index(vectors, kind="ivfpq", train_size=None, nprobe=32, ef_search=64, seed=0):
+    # Returns (index, params). The quantizers are trained on at most train_size random vectors
+    # (default: 100 per inverted list, at least 10,000), then every vector is added in order.
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+    spec = index_spec(kind, dim, n_vectors)
+    index = faiss.index_factory(dim, spec, faiss.METRIC_L2)
+
+    train_size = train_size or max(10_000, 100 * default_nlist(n_vectors))
+    train_size = min(train_size, n_vectors)
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n_vectors, size=train_size, replace=False)]
+        start = time.perf_counter()
+        index.train(sample)
+        print(f"Trained {spec} on {train_size} vectors in {time.perf_counter() - start:.1f}s")
+    index.add(vectors)
+    set_search_params(index, nprobe, ef_search)
+
+    params = {
+        "kind": kind,
+        "spec": spec,
+        "dim": dim,
+        "train_size": train_size if kind != "flat" else 0,
+        "nprobe": nprobe,
+        "ef_search": ef_search,
+    }
+    return index, params
+
+
+def save_params(index_dir, params):
+    with open(os.path.join(index_dir, INDEX_PARAMS_NAME), "w") as file:
+        json.dump(params, file, indent=2)
+
+
+def load_params(index_dir):
+    path = os.path.join(index_dir, INDEX_PARAMS_NAME)
+    if not os.path.exists(path):
+        return {"kind": "flat"}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def apply_params(vector_store, index_dir):
+    # Call after FAISS.load_local so the persisted nprobe/efSearch are used even if they were changed by hand
+    params = load_params(index_dir)
+    set_search_params(vector_store.index, params.get("nprobe", 32), params.get("ef_search", 64))
+    return params
+
+
+def convert_store(vector_store, kind="ivfpq", **kwargs):
+    # Replaces the store's flat index with a trained index of the given kind. Vector positions are unchanged,
+    # so index_to_docstore_id and the docstore stay valid.
+    index, params = build_index(all_vectors(vector_store.index), kind, **kwargs)
+    vector_store.index = index
+    return params
+
+
+# --- 3. Deleting from IVF Indexes ---
+def delete_vectors(vector_store, ids):
+    # LangChain's FAISS.delete renumbers the remaining vectors 0..n-1, which matches flat/SQ/PQ indexes (they
+    # compact on remove_ids) but not IVF indexes, which keep their labels. Relabel the inverted lists to match.
+    if not ids:
+        return
+    index = vector_store.index
+    if getattr(faiss.downcast_index(index), "hnsw", None) is not None:
+        raise ValueError("HNSW indexes do not support deletes; rebuild the index or use an IVF/flat kind")
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        vector_store.delete(ids)
+        return
+
+    reversed_index = {docstore_id: position for position, docstore_id in vector_store.index_to_docstore_id.items()}
+    removed = np.sort(np.fromiter((reversed_index[i] for i in ids), dtype=np.int64))
+    vector_store.delete(ids)
+    invlists = ivf.invlists
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if size == 0:
+            continue
+        labels = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+        labels -= np.searchsorted(removed, labels)
+
+
+# --- 4. Recall / Latency Evaluation ---
+def evaluate(index, reference, queries, k=10, single_queries=200):
+    # recall@k of index against the exact reference index, per-query latency (p50/p99) and batch throughput
+    _, expected = reference.search(queries, k)
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    batch_seconds = time.perf_counter() - start
+    recall = np.mean([len(set(f) & set(e)) / k for f, e in zip(found, expected)])
+
+    latencies = []
+    for query in queries[:single_queries]:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "recall": float(recall),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "qps": len(queries) / batch_seconds,
+        "bytes_per_vector": faiss.serialize_index(index).size / max(index.ntotal, 1),
+    }
+
+
+def run_evaluation(vectors, kinds=("flat", "sq8", "hnsw", "ivfsq8", "ivfpq"), n_queries=1000, k=10, seed=0):
+    # Held-out stored vectors serve as queries; each candidate is built from the remaining vectors
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(vectors))
+    queries = np.ascontiguousarray(vectors[order[:n_queries]], dtype=np.float32)
+    base = np.ascontiguousarray(vectors[order[n_queries:]], dtype=np.float32)
+    reference, _ = build_index(base, "flat")
+
+    print(f"{'kind':<10}{'spec':<22}{'recall@' + str(k):>10}{'p50 ms':>9}{'p99 ms':>9}{'QPS':>10}{'B/vec':>8}")
+    for kind in kinds:
+        index, params = build_index(base, kind)
+        result = evaluate(index, reference, queries, k)
+        print(
+            f"{kind:<10}{params['spec']:<22}{result['recall']:>10.3f}{result['p50_ms']:>9.2f}"
+            f"{result['p99_ms']:>9.2f}{result['qps']:>10.0f}{result['bytes_per_vector']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    # python faiss_index_factory.py <index_dir> [kind ...]: evaluates the kinds against the stored vectors
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else "faiss_index"
+    kinds = sys.argv[2:] or ["flat", "sq8", "hnsw", "ivfsq8", "ivfpq"]
+    stored = faiss.read_index(os.path.join(index_dir, "index.faiss"))
+    run_evaluation(all_vectors(stored), kinds)
@@ -0,0 +1,202 @@
+# Memory-mapped loading of a saved faiss_index for fast cold starts.
+# FAISS.load_local reads index.faiss into RAM and unpickles the whole docstore (index.pkl), so every query worker
+# spends minutes booting and holds a private copy of everything. Here the vector file is memory-mapped
+# (faiss IO_FLAG_MMAP / IO_FLAG_MMAP_IFC) and document text + metadata live in a columnar side directory of flat
+# arrays (columns/), also memory-mapped. Workers on one host share the page cache instead of copying, start in
+# seconds, and only touch the rows that queries actually return.
+#
+# columns/ layout, one row per vector position:
+#   text.bin + text_offsets.npy     page_content, UTF-8, row i is text.bin[offsets[i]:offsets[i + 1]]
+#   id.bin + id_offsets.npy         docstore IDs (kept for tooling; queries do not need them)
+#   id_order.npy                    rows sorted by docstore ID, for binary-search lookups by ID (BM25 hits)
+#   sources.json + source.npy       distinct "source" values and one int32 code per row
+#   page.npy, start_index.npy       integer metadata, -1 when absent
+#   extra.bin + extra_offsets.npy   any other metadata keys as JSON, empty when there are none
+# Install dependencies if not already installed: pip install faiss-cpu numpy langchain
+
+import bisect
+import json
+import mmap
+import os
+from array import array
+from collections.abc import Mapping, Sequence
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+
+from faiss_index_factory import apply_params, load_params
+
+COLUMNS_DIR = "columns"
+INTEGER_COLUMNS = ("page", "start_index")
+IVF_KINDS = ("ivfsq8", "ivfpq", "opqivfpq")
+
+
+# --- 1. Writing the Columnar Side File ---
+def _write_blob_column(directory, name, values):
+    # values: iterable of bytes; writes name.bin and name_offsets.npy (int64, len + 1 entries)
+    offsets = array("q", [0])
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as file:
+        for value in values:
+            file.write(value)
+            offsets.append(offsets[-1] + len(value))
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), np.frombuffer(offsets, dtype=np.int64))
+
+
+def write_columnar_docstore(vector_store, index_dir):
+    directory = os.path.join(index_dir, COLUMNS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    ids = [vector_store.index_to_docstore_id[i] for i in range(vector_store.index.ntotal)]
+    documents = [vector_store.docstore.search(vector_id) for vector_id in ids]
+
+    _write_blob_column(directory, "text", (d.page_content.encode("utf-8") for d in documents))
+    _write_blob_column(directory, "id", (str(vector_id).encode("utf-8") for vector_id in ids))
+    id_order = sorted(range(len(ids)), key=lambda row: str(ids[row]))
+    np.save(os.path.join(directory, "id_order.npy"), np.asarray(id_order, dtype=np.int64))
+
+    source_codes = {}
+    source = np.fromiter(
+        (source_codes.setdefault(d.metadata.get("source"), len(source_codes)) for d in documents),
+        dtype=np.int32,
+        count=len(documents),
+    )
+    np.save(os.path.join(directory, "source.npy"), source)
+    with open(os.path.join(directory, "sources.json"), "w") as file:
+        json.dump(list(source_codes), file)
+
+    for key in INTEGER_COLUMNS:
+        column = np.fromiter((d.metadata.get(key, -1) for d in documents), dtype=np.int64, count=len(documents))
+        np.save(os.path.join(directory, f"{key}.npy"), column)
+
+    known = {"source", *INTEGER_COLUMNS}
+    _write_blob_column(directory, "extra", (
+        json.dumps({k: v for k, v in d.metadata.items() if k not in known}).encode("utf-8")
+        if set(d.metadata) - known else b""
+        for d in documents
+    ))
+
+
+# --- 2. Memory-Mapped Docstore ---
+class _BlobColumn:
+    def __init__(self, directory, name):
+        self.offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r")
+        path = os.path.join(directory, f"{name}.bin")
+        self.data = b""
+        if os.path.getsize(path):
+            with open(path, "rb") as file:
+                self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, row):
+        return self.data[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+
+class ColumnarDocstore:
+    # Read-only docstore keyed by vector position; search(row) builds the Document on demand
+    def __init__(self, index_dir):
+        directory = os.path.join(index_dir, COLUMNS_DIR)
+        self.text = _BlobColumn(directory, "text")
+        self.ids = _BlobColumn(directory, "id")
+        self.extra = _BlobColumn(directory, "extra")
+        self.source = np.load(os.path.join(directory, "source.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "sources.json"), "r") as file:
+            self.sources = json.load(file)
+        self.integers = {
+            key: np.load(os.path.join(directory, f"{key}.npy"), mmap_mode="r") for key in INTEGER_COLUMNS
+        }
+        order_path = os.path.join(directory, "id_order.npy")
+        if os.path.exists(order_path):
+            self.id_order = np.load(order_path, mmap_mode="r")
+        else:  # written before id_order.npy existed: sorted once in memory
+            self.id_order = np.asarray(sorted(range(len(self.source)), key=self.docstore_id), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.source)
+
+    def search(self, row):
+        metadata = {}
+        source = self.sources[self.source[row]]
+        if source is not None:
+            metadata["source"] = source
+        for key, column in self.integers.items():
+            if column[row] != -1:
+                metadata[key] = int(column[row])
+        extra = self.extra[row]
+        if extra:
+            metadata.update(json.loads(extra))
+        return Document(page_content=self.text[row].decode("utf-8"), metadata=metadata)
+
+    def docstore_id(self, row):
+        return self.ids[row].decode("utf-8")
+
+    def row_of(self, docstore_id):
+        # Reverse lookup for callers that only know the docstore ID (e.g. BM25 hits): a binary search over the
+        # mapped id_order column, O(log N) ID reads and nothing built in memory
+        sorted_ids = _SortedIds(self)
+        position = bisect.bisect_left(sorted_ids, docstore_id)
+        if position == len(sorted_ids) or sorted_ids[position] != docstore_id:
+            raise KeyError(docstore_id)
+        return int(self.id_order[position])
+
+
+class _SortedIds(Sequence):
+    # The docstore IDs in sorted order, read on demand, for bisect
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position):
+        return self.docstore.docstore_id(int(self.docstore.id_order[position]))
+
+    def __len__(self):
+        return len(self.docstore.id_order)
+
+
+class RowIds(Mapping):
+    # Stands in for FAISS.index_to_docstore_id without a dict of N entries: position i maps to row i
+    def __init__(self, count):
+        self.count = count
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.count:
+            raise KeyError(position)
+        return int(position)
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __len__(self):
+        return self.count
+
+
+# --- 3. Loading a Shared, Memory-Mapped Store ---
+def read_index_mmap(index_dir):
+    # IVF kinds map their inverted lists, flat-code kinds (flat, sq8, hnsw storage) map their code arrays
+    path = os.path.join(index_dir, "index.faiss")
+    if load_params(index_dir)["kind"] in IVF_KINDS:
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    else:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    return faiss.read_index(path, flags)
+
+
+def load_mmap_store(index_dir, embeddings):
+    # Read-only: similarity_search works as usual, add_documents/delete do not (use rag_ingest.py to update)
+    if not os.path.exists(os.path.join(index_dir, COLUMNS_DIR)):
+        raise FileNotFoundError(
+            f"{index_dir} has no {COLUMNS_DIR}/: it is written with the last save of an ingest run, "
+            "rerun rag_ingest.py to finish an interrupted run"
+        )
+    index = read_index_mmap(index_dir)
+    docstore = ColumnarDocstore(index_dir)
+    if len(docstore) != index.ntotal:
+        raise ValueError(
+            f"{index_dir}: {COLUMNS_DIR}/ has {len(docstore)} rows but index.faiss has {index.ntotal} vectors"
+        )
+    vector_store = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=RowIds(index.ntotal),
+    )
+    apply_params(vector_store, index_dir)
+    return vector_store
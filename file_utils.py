@@ -0,0 +1,45 @@
+# File helpers shared by the ingestion, loader and cache modules.
+# Kept free of heavy imports (no LangChain, no FAISS): pool workers that only need to hash a file import this module
+# instead of the modules that use it.
+# Install dependencies if not already installed: pip install zstandard (optional, zlib otherwise)
+
+import hashlib
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zlib is in the standard library; cache entries record which codec wrote them
+    zstandard = None
+
+
+# --- 1. Content Hashes and Directory Listing ---
+def file_hash(path, block_size=1 << 20):
+    # SHA-256 of the file content, read in 1 MB blocks so large files are never held in memory
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_pdfs(directory_path):
+    return sorted(
+        os.path.join(directory_path, name)
+        for name in os.listdir(directory_path)
+        if name.endswith(".pdf")
+    )
+
+
+# --- 2. Blob Compression for the SQLite Caches ---
+def compress(data, level=3):
+    # Returns (codec, blob); the codec is stored with the blob so either side can be missing zstandard later
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=level).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def decompress(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
@@ -18,6 +18,19 @@ for i, doc in enumerate(documents):
     print(f"  Content (first 100 characters): {doc.page_content[:100]}...")
     print("-" * 50)
 
+# Large directories: stream pages as worker processes extract them instead of loading everything at once.
+# Same Documents and source/page metadata; memory stays flat and a PDF that takes longer than file_timeout
+# seconds is skipped (see streaming_pdf_loader.py). With cache_path, PDFs whose content was parsed before are
+# read back from the extracted-text cache instead of being parsed again (see pdf_text_cache.py)
+from streaming_pdf_loader import StreamingPDFLoader
+
+streaming_loader = StreamingPDFLoader(
+    path=directory_path, max_workers=4, file_timeout=120, cache_path="pdf_text_cache.sqlite"
+)
+for doc in streaming_loader.lazy_load():
+    print(f"  Source: {doc.metadata['source']}, Page: {doc.metadata['page']}, Characters: {len(doc.page_content)}")
+print(f"Skipped {len(streaming_loader.failed)} PDFs:", streaming_loader.failed)
+
 Output :
 Output (assuming 2 PDFs with 2 and 3 pages):
   
@@ -35,6 +35,23 @@ for i, doc in enumerate(documents):
     print(f"Start Index: {doc.metadata['start_index']}")
     print(f"Metadata: {doc.metadata}\n")
 
+# Streaming alternative for very large texts (see streaming_text_splitter.py):
+# same chunks and start_index metadata as above, but the text is read in windows from a file or iterator,
+# so a multi-hundred-MB extracted text is never held in memory as one string
+from streaming_text_splitter import StreamingTextSplitter
+
+streaming_splitter = StreamingTextSplitter(chunk_size=200, chunk_overlap=50, window_size=1 << 20)
+streamed_documents = list(streaming_splitter.create_documents(text))  # or .split_file("extracted.txt")
+print("Streaming splitter matches:", [d.page_content for d in streamed_documents] == [d.page_content for d in documents])
+
+# Token-aware alternative (see token_text_splitter.py): chunk sizes are counted in tokens of the embedding
+# model's tokenizer (cl100k_base for OpenAI embeddings), so every embedding input has a predictable length
+from token_text_splitter import TokenTextChunker
+
+token_chunker = TokenTextChunker(chunk_tokens=64, overlap_tokens=16, encoding_name="cl100k_base")
+for doc in token_chunker.create_documents([text]):
+    print(f"Start Index: {doc.metadata['start_index']}, Tokens: {doc.metadata['tokens']}")
+
 
 Output :
 
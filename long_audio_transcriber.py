@@ -0,0 +1,146 @@
+# Long-form transcription with the Whisper pipeline: streamed, windowed and batched.
+# pipe("customer_call.wav") decodes the whole file into memory and, on CPU, runs it one 30-second segment at a
+# time. transcribe_long() instead
+#   - streams the audio from disk in overlapping windows (window_s long, consecutive windows share overlap_s
+#     seconds), converted to 16 kHz mono one window at a time, so memory depends on batch_size, not on the length
+#     of the call,
+#   - sends batch_size windows to the model in one pipeline call,
+#   - shifts the per-window "chunks" timestamps by the window's start time and keeps, from each overlap, only the
+#     chunks whose midpoint falls in that window's half, so words are neither lost nor repeated at the seams.
+# The result has the pipeline's shape: {"text": ..., "chunks": [{"timestamp": (start, end), "text": ...}]}.
+# Benchmark real-time factor (processing time / audio duration, lower is better) against batch size:
+#     python long_audio_transcriber.py customer_call.wav [openai/whisper-small]
+# Install dependencies if not already installed: pip install transformers torch soundfile numpy scipy
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+SAMPLING_RATE = 16_000  # what Whisper's feature extractor expects
+
+
+# --- 1. Streaming Overlapping Windows from Disk ---
+def to_model_input(block, samplerate):
+    # float32 mono at 16 kHz
+    if block.ndim > 1:
+        block = block.mean(axis=1)
+    if samplerate != SAMPLING_RATE:
+        from math import gcd
+
+        from scipy.signal import resample_poly
+
+        divisor = gcd(SAMPLING_RATE, samplerate)
+        block = resample_poly(block, SAMPLING_RATE // divisor, samplerate // divisor)
+    return np.ascontiguousarray(block, dtype=np.float32)
+
+
+def iter_windows(path, window_s=30.0, overlap_s=5.0):
+    # Yields (start_seconds, duration_seconds, samples) for consecutive windows that overlap by overlap_s
+    if not 0 <= overlap_s < window_s:
+        raise ValueError(f"overlap_s ({overlap_s}) must be in [0, window_s ({window_s}))")
+    info = sf.info(path)
+    blocksize = int(window_s * info.samplerate)
+    overlap = int(overlap_s * info.samplerate)
+    start = 0
+    for block in sf.blocks(path, blocksize=blocksize, overlap=overlap, dtype="float32", always_2d=False):
+        yield start / info.samplerate, len(block) / info.samplerate, to_model_input(block, info.samplerate)
+        if len(block) < blocksize:  # the last (short) window
+            break
+        start += blocksize - overlap
+
+
+def with_last_flag(windows):
+    # Adds an is_last flag to every window (the last one keeps the chunks in its trailing overlap)
+    current = next(windows, None)
+    while current is not None:
+        following = next(windows, None)
+        yield (*current, following is None)
+        current = following
+
+
+def iter_batches(windows, batch_size):
+    batch = []
+    for window in windows:
+        batch.append(window)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- 2. Stitching Window Timestamps ---
+def stitch_window(chunks, start, duration, overlap_s, is_first, is_last):
+    # Shifts the chunks of one window to global time and keeps those whose midpoint lies in the part of the
+    # window this window is responsible for: the overlaps are split in half with the neighbouring windows
+    owned_from = start if is_first else start + overlap_s / 2
+    owned_to = start + duration if is_last else start + duration - overlap_s / 2
+    kept = []
+    for chunk in chunks:
+        chunk_start, chunk_end = chunk["timestamp"]
+        chunk_start = 0.0 if chunk_start is None else chunk_start
+        chunk_end = duration if chunk_end is None else chunk_end  # Whisper may leave the last end open
+        global_start, global_end = start + chunk_start, start + min(chunk_end, duration)
+        midpoint = (global_start + global_end) / 2
+        if owned_from <= midpoint < owned_to or (is_last and midpoint == owned_to):
+            kept.append({"timestamp": (round(global_start, 2), round(global_end, 2)), "text": chunk["text"]})
+    return kept
+
+
+def transcribe_long(pipe, path, window_s=30.0, overlap_s=5.0, batch_size=8, generate_kwargs=None):
+    # Yields stitched chunks in order, as soon as each batch of windows is transcribed
+    generate_kwargs = {**(generate_kwargs or {}), "return_timestamps": True}
+    is_first = True
+    for batch in iter_batches(with_last_flag(iter_windows(path, window_s, overlap_s)), batch_size):
+        inputs = [{"raw": samples, "sampling_rate": SAMPLING_RATE} for _, _, samples, _ in batch]
+        results = pipe(inputs, batch_size=batch_size, generate_kwargs=generate_kwargs)
+        for (start, duration, _, is_last), result in zip(batch, results):
+            yield from stitch_window(result["chunks"], start, duration, overlap_s, is_first, is_last)
+            is_first = False
+
+
+def transcribe_file(pipe, path, **kwargs):
+    # Same result shape as pipe(path, generate_kwargs={..., "return_timestamps": True})
+    chunks = list(transcribe_long(pipe, path, **kwargs))
+    return {"text": "".join(chunk["text"] for chunk in chunks).strip(), "chunks": chunks}
+
+
+# --- 3. Benchmark: Real-Time Factor vs. Batch Size ---
+def benchmark_rtf(pipe, path, batch_sizes=(1, 2, 4, 8, 16), max_seconds=300.0, **kwargs):
+    # RTF = wall time / audio seconds, over at most the first max_seconds of the file (< 1: faster than real time)
+    info = sf.info(path)
+    duration = min(info.duration, max_seconds)
+    clip = path
+    if duration < info.duration:
+        data, samplerate = sf.read(path, frames=int(duration * info.samplerate), dtype="float32")
+        clip = tempfile.NamedTemporaryFile(suffix=".wav", delete=False).name
+        sf.write(clip, data, samplerate)
+
+    results = {}
+    try:
+        next(transcribe_long(pipe, clip, batch_size=1, **kwargs), None)  # warm-up on the first window
+        print(f"Audio: {duration:.0f}s of {path}")
+        print(f"{'batch':>6}{'seconds':>10}{'RTF':>8}{'x realtime':>12}")
+        for batch_size in batch_sizes:
+            start = time.perf_counter()
+            list(transcribe_long(pipe, clip, batch_size=batch_size, **kwargs))
+            seconds = time.perf_counter() - start
+            results[batch_size] = seconds / duration
+            print(f"{batch_size:>6}{seconds:>10.1f}{seconds / duration:>8.3f}{duration / seconds:>12.1f}")
+    finally:
+        if clip != path:  # the trimmed copy
+            os.remove(clip)
+    return results
+
+
+if __name__ == "__main__":
+    from transformers import pipeline
+
+    audio_path = sys.argv[1] if len(sys.argv) > 1 else "customer_call.wav"
+    model_name = sys.argv[2] if len(sys.argv) > 2 else "openai/whisper-small"
+    cpu_pipe = pipeline("automatic-speech-recognition", model=model_name, device="cpu")
+    benchmark_rtf(cpu_pipe, audio_path, generate_kwargs={"task": "transcribe", "language": "english"})
@@ -0,0 +1,223 @@
+# On-disk cache of extracted PDF text, shared by the loaders and ingestion.
+# Parsing PDFs is the dominant CPU cost before embedding, and every run of langchain_document_loaders.py,
+# rag_app.py and rag_bulk_pdf.py re-parses the same files. PDFTextCache stores the per-page text (zstd
+# compressed) and page metadata of every parsed file in a SQLite file keyed by (SHA-256 of the file content,
+# loader version): a renamed or copied PDF is still a hit, and upgrading pypdf or changing the extraction
+# code invalidates the entries it produced. The cache is capped in bytes and evicts least recently used files.
+#     python pdf_text_cache.py warm ./pdfs [--loader StreamingPDFLoader]   parse a directory into the cache
+#     python pdf_text_cache.py prune --max-mb 512                          evict down to a size
+#     python pdf_text_cache.py stats
+# Install dependencies if not already installed: pip install zstandard pypdf
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from file_utils import compress, decompress, file_hash, list_pdfs
+
+CACHE_FORMAT = 1
+
+
+# --- 1. Keys ---
+def loader_version(loader_name):
+    # e.g. "PyPDFLoader/pypdf-4.2.0/1": any change in the parser or the extraction code gives new keys
+    try:
+        from pypdf import __version__ as pypdf_version
+    except ImportError:
+        pypdf_version = "unknown"
+    return f"{loader_name}/pypdf-{pypdf_version}/{CACHE_FORMAT}"
+
+
+def entry_key(content_hash, loader):
+    return hashlib.sha256(f"{content_hash}\0{loader}".encode("utf-8")).hexdigest()
+
+
+# --- 2. SQLite-Backed Cache with Size-Capped LRU Eviction ---
+class PDFTextCache:
+    def __init__(self, path="pdf_text_cache.sqlite", max_bytes=2 << 30, level=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.level = level
+        self.hits = 0
+        self.misses = 0
+        # WAL lets the loader's worker processes read and write the cache concurrently
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "key TEXT PRIMARY KEY, loader TEXT NOT NULL, pages INTEGER NOT NULL, bytes INTEGER NOT NULL, "
+            "codec TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT NOT NULL, page INTEGER NOT NULL, data BLOB NOT NULL, PRIMARY KEY (key, page)) WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    def get(self, content_hash, loader):
+        # Returns [(metadata, text)] per page (metadata without "source"), or None on a miss
+        key = entry_key(content_hash, loader)
+        row = self.connection.execute("SELECT codec, pages FROM files WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        pages = []
+        for (data,) in self.connection.execute("SELECT data FROM pages WHERE key = ? ORDER BY page", (key,)):
+            record = json.loads(decompress(row[0], data))
+            pages.append((record["metadata"], record["text"]))
+        if len(pages) != row[1]:  # evicted by another process between the two reads
+            self.misses += 1
+            return None
+        with self.connection:
+            self.connection.execute("UPDATE files SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return pages
+
+    def put(self, content_hash, loader, pages):
+        # pages: [(metadata, text)]; "source" is dropped from metadata since identical files share an entry
+        key = entry_key(content_hash, loader)
+        blobs = []
+        codec = None
+        for metadata, text in pages:
+            record = {"metadata": {k: v for k, v in metadata.items() if k != "source"}, "text": text}
+            codec, blob = compress(json.dumps(record).encode("utf-8"), self.level)
+            blobs.append(blob)
+        with self.connection:
+            self.connection.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self.connection.executemany(
+                "INSERT INTO pages (key, page, data) VALUES (?, ?, ?)",
+                [(key, page, blob) for page, blob in enumerate(blobs)],
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (key, loader, pages, bytes, codec, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, loader, len(blobs), sum(map(len, blobs)), codec or "zlib", time.time()),
+            )
+        self.evict()
+
+    def size(self):
+        return self.connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM files").fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        # Drops least recently used files until the cache is at most max_bytes; returns how many were dropped
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        excess = self.size() - max_bytes
+        if excess <= 0:
+            return 0
+        victims, freed = [], 0
+        for key, size in self.connection.execute("SELECT key, bytes FROM files ORDER BY last_used"):
+            if freed >= excess:
+                break
+            victims.append((key,))
+            freed += size
+        with self.connection:
+            self.connection.executemany("DELETE FROM pages WHERE key = ?", victims)
+            self.connection.executemany("DELETE FROM files WHERE key = ?", victims)
+        return len(victims)
+
+    def stats(self):
+        files, pages, size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(pages), 0), COALESCE(SUM(bytes), 0) FROM files"
+        ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "files": files,
+            "pages": pages,
+            "megabytes": size / 1e6,
+        }
+
+    def close(self):
+        self.connection.close()
+
+
+@lru_cache(maxsize=None)
+def open_text_cache(path="pdf_text_cache.sqlite"):
+    # One connection per process (and per pool worker), reused across files
+    return PDFTextCache(path)
+
+
+# --- 3. Cached Extraction ---
+LOADERS = ("PyPDFLoader", "StreamingPDFLoader")
+
+
+def iter_pypdf_pages(path):
+    # What StreamingPDFLoader extracts: ({"page": page_number}, page.extract_text()) per page, lazily
+    from pypdf import PdfReader
+
+    for page_number, page in enumerate(PdfReader(path).pages):
+        yield {"page": page_number}, page.extract_text()
+
+
+def load_pdf_pages(path, cache=None, content_hash=None):
+    # Same Documents as PyPDFLoader(path).load(); parsed once per file content and loader version
+    from langchain.document_loaders import PyPDFLoader
+    from langchain.schema import Document
+
+    if cache is None:
+        return PyPDFLoader(path).load()
+    loader = loader_version("PyPDFLoader")
+    content_hash = content_hash or file_hash(path)
+    pages = cache.get(content_hash, loader)
+    if pages is None:
+        documents = PyPDFLoader(path).load()
+        cache.put(content_hash, loader, [(document.metadata, document.page_content) for document in documents])
+        return documents
+    return [Document(page_content=text, metadata={"source": path, **metadata}) for metadata, text in pages]
+
+
+def warm_file(path, cache_path, loader_name="PyPDFLoader"):
+    # Runs inside a worker process of the warm command; returns True if the file was already cached
+    cache = PDFTextCache(cache_path, max_bytes=float("inf"))  # the warm command evicts once at the end
+    try:
+        content_hash = file_hash(path)
+        loader = loader_version(loader_name)
+        hit = cache.get(content_hash, loader) is not None
+        if not hit and loader_name == "StreamingPDFLoader":
+            cache.put(content_hash, loader, list(iter_pypdf_pages(path)))
+        elif not hit:
+            load_pdf_pages(path, cache, content_hash)
+        return hit
+    finally:
+        cache.close()
+
+
+# --- 4. Command Line: warm / prune / stats ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extracted-text cache for PDFs")
+    parser.add_argument("--cache", default="pdf_text_cache.sqlite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    warm = commands.add_parser("warm", help="parse every PDF of a directory into the cache")
+    warm.add_argument("directory")
+    warm.add_argument("--workers", type=int, default=None)
+    warm.add_argument("--loader", choices=LOADERS, default="PyPDFLoader", help="loader whose output to cache")
+    prune = commands.add_parser("prune", help="evict least recently used files down to a size")
+    prune.add_argument("--max-mb", type=float, required=True)
+    commands.add_parser("stats", help="print the cache size")
+    args = parser.parse_args(argv)
+
+    if args.command == "warm":
+        paths = list_pdfs(args.directory)
+        PDFTextCache(args.cache).close()  # create the schema before the workers start
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            hits = sum(pool.map(warm_file, paths, [args.cache] * len(paths), [args.loader] * len(paths), chunksize=4))
+        print(f"Warmed {len(paths)} PDFs ({hits} already cached) in {time.perf_counter() - start:.1f}s")
+    cache = PDFTextCache(args.cache)
+    if args.command == "prune":
+        print(f"Evicted {cache.evict(int(args.max_mb * 1e6))} files")
+    elif args.command == "warm":
+        cache.evict()
+    print(cache.stats())
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,31 +5,93 @@ from langchain.vectorstores import Chroma
 from langchain.embeddings import OpenAIEmbeddings  # Or use OllamaEmbeddings
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from chunk_dedup import ChunkDeduplicator
 
 # Specify the directory containing PDF files
 directory_path = "./pdfs"
 
-# Initialize the loader
-loader = PyPDFDirectoryLoader(path=directory_path)
-
-# Load all PDFs into a list of Document objects
-documents = loader.load()
-
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=50, length_function=len, 
-    separators=["\n\n", "\n", " ", ""],
-    add_start_index=True  # Enable start_index in metadata
-)
-
-# Create documents (chunks with metadata)
-chunked_documents = text_splitter.create_documents([documents])
-
 # Initialize embeddings (replace with OllamaEmbeddings for local models)
 embeddings = OpenAIEmbeddings(openai_api_key="your-openai-api-key")  # Set your API key
 # embeddings = OllamaEmbeddings(model="llama3")
 # embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
-# Create a FAISS vector store from the chunked documents
-vector_store = FAISS.from_documents(chunked_documents, embeddings)
+# Route every embedding call through the on-disk cache shared by the RAG scripts:
+# chunks that were embedded before (in any run, by any script) never reach the model again
+embedding_cache = EmbeddingCache("embedding_cache.sqlite", max_entries=5_000_000)
+embeddings = CachedEmbeddings(embeddings, embedding_cache)
+
+# Index mode:
+#   "incremental" - diff ./pdfs against the manifest stored in faiss_index and embed only new or changed pages,
+#                   deleting the vectors of removed or modified files (see rag_ingest.py)
+#   "rebuild"     - load, split and embed the whole directory on every start
+index_mode = "incremental"
+chunking = "characters"  # or "tokens": chunks of 256 tokens of the embedding model (see token_text_splitter.py)
+deduplicate = True  # drop exact and near-duplicate chunks before embedding (see chunk_dedup.py)
+index_kind = "flat"  # or "sq8", "hnsw", "ivfsq8", "ivfpq", "opqivfpq" (see faiss_index_factory.py)
+
+dedup = ChunkDeduplicator(threshold=0.85) if deduplicate else None
+
+if index_mode == "incremental":
+    from rag_ingest import ingest_directory
+
+    vector_store = ingest_directory(
+        directory_path,
+        embeddings,
+        index_dir="faiss_index",
+        chunking=chunking,
+        chunk_size=256 if chunking == "tokens" else 200,
+        chunk_overlap=32 if chunking == "tokens" else 50,
+        dedup=dedup,
+        index_kind=index_kind,
+        text_cache="pdf_text_cache.sqlite"  # parsed page text is reused across runs and scripts (pdf_text_cache.py)
+    )
+else:
+    # Initialize the loader: pages are extracted on a process pool and streamed, with the same source/page
+    # metadata as PyPDFDirectoryLoader (see streaming_pdf_loader.py)
+    from streaming_pdf_loader import StreamingPDFLoader
+
+    loader = StreamingPDFLoader(path=directory_path, file_timeout=120, cache_path="pdf_text_cache.sqlite")
+
+    # Lazily iterate over the pages (Document objects) instead of loading the whole directory first
+    documents = loader.lazy_load()
+
+    # Streaming splitter: same chunks as RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=50,
+    # separators=["\n\n", "\n", " ", ""], add_start_index=True), without materializing whole texts at once
+    from streaming_text_splitter import StreamingTextSplitter
+
+    text_splitter = StreamingTextSplitter(chunk_size=200, chunk_overlap=50)
+
+    # Create documents (chunks with source/page metadata plus start_index)
+    chunked_documents = [
+        chunk
+        for document in documents
+        for chunk in text_splitter.create_documents(document.page_content, document.metadata)
+    ]
+
+    # Drop repeated headers, footers and boilerplate chunks before embedding them
+    if dedup is not None:
+        chunked_documents = dedup.filter_documents(chunked_documents, collapse=True)
+        print(dedup.report())
+
+    # Create a FAISS vector store from the chunked documents
+    vector_store = FAISS.from_documents(chunked_documents, embeddings)
+
+    # Swap the exact flat index for a trained approximate one
+    if index_kind != "flat":
+        from faiss_index_factory import convert_store
+
+        convert_store(vector_store, index_kind)
+
+# Lexical BM25 index over the same chunks, fused with the dense results (see bm25_index.py). Exact terms that
+# embeddings blur (names, codes, acronyms) are found, so k stays small and so does the LLM context
+from bm25_index import BM25Index, HybridRetriever, load_lexical_index
+
+if index_mode == "incremental":
+    lexical_index = load_lexical_index("faiss_index", vector_store)  # kept in step by ingest_directory
+else:
+    lexical_index = BM25Index.from_vector_store(vector_store)
+
 # Initialize Chroma vector store
 # vector_store = Chroma.from_texts(
 #    texts=chunks,
@@ -42,17 +104,53 @@ vector_store = FAISS.from_documents(chunked_documents, embeddings)
 # Initialize the LLM (e.g., OpenAI with temperature=0.5 from your earlier question)
 llm = ChatOpenAI(model_name="gpt-4", temperature=0.5, openai_api_key="your-openai-api-key")
 
-# Create a RetrievalQA chain
-qa_chain = RetrievalQA.from_chain_type(
-    llm=llm,
-    chain_type="stuff",  # Simple method to combine retrieved documents
-    retriever=vector_store.as_retriever(search_kwargs={"k": 3}),  # Retrieve top 3 chunks
-    return_source_documents=True  # Return source metadata
-)
+# Query mode:
+#   "chain"  - one synchronous qa_chain call per question
+#   "server" - asyncio QueryServer: questions are micro-batched into one index search,
+#              LLM calls run concurrently (at most 8 at a time) and p50/p99 latencies are reported
+#              (see rag_query_server.py); use_stub_llm=True replaces the LLM with a local stub for testing
+query_mode = "chain"
+use_stub_llm = False
+
+# Answer cache: repeated and reworded questions are answered without retrieval or an LLM call, in both query modes.
+# The query embedding (cached on disk by CachedEmbeddings, so the chain reuses it) drives the semantic
+# tier; answers are dropped whenever the saved faiss_index changes (see answer_cache.py)
+from answer_cache import AnswerCache, cached_answer, index_version
 
-# Query the RAG system
-query = "What are the applications of AI?"
-result = qa_chain({"query": query})
+answer_cache = AnswerCache(threshold=0.95, ttl=3600, max_entries=10_000)
+answer_cache.set_version(index_version("faiss_index"))
+
+if query_mode == "server":
+    import asyncio
+
+    from rag_query_server import ChatModelLLM, QueryServer, StubLLM, run_load_test
+
+    async def serve(questions):
+        server_llm = StubLLM(delay=0.5) if use_stub_llm else ChatModelLLM(llm)
+        async with QueryServer(
+            vector_store, embeddings, server_llm, k=3, max_concurrent_llm=8, answer_cache=answer_cache
+        ) as server:
+            results = await run_load_test(server, questions)
+        print(server.metrics.report())
+        return results
+
+    queries = ["What are the applications of AI?", "What is deep learning?", "How does AI help in finance?"]
+    results = asyncio.run(serve(queries * 20))
+    result = results[0]
+else:
+    # Create a RetrievalQA chain
+    qa_chain = RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",  # Simple method to combine retrieved documents
+        # Top 3 chunks after fusing the 20 best dense and 20 best BM25 results
+        retriever=HybridRetriever(vector_store=vector_store, lexical_index=lexical_index, k=3, fetch_k=20),
+        return_source_documents=True  # Return source metadata
+    )
+
+    # Query the RAG system
+    query = "What are the applications of AI?"
+    result = cached_answer(answer_cache, query, embeddings.embed_query(query), lambda: qa_chain({"query": query}))
+print("Answer cache:", answer_cache.stats())
 
 # Print the answer and source documents
 print("Answer:", result["result"])
@@ -61,3 +159,6 @@ for doc in result["source_documents"]:
     print(f"  Source: {doc.metadata['source']}, Page: {doc.metadata['page']}, Start Index: {doc.metadata['start_index']}")
     print(f"  Content: {doc.page_content[:100]}...")
     print("-" * 50)
+
+# Embedding cache effectiveness for this run
+print("Embedding cache:", embedding_cache.stats())
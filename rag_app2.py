@@ -1,6 +1,10 @@
+import os
+
 import chromadb
-from sentence_transformers import SentenceTransformer
-from chromadb.utils import embedding_functions
+from answer_cache import AnswerCache, bump_ingest_counter, cached_answer, ingest_counter
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from embedding_cache import EmbeddingCache
+from embedding_service import EmbeddingService, add_to_collection
 
 # Sample document (replace with your own chunked documents if available)
 sample_document = """
@@ -12,11 +16,11 @@ They are useful for tasks like semantic search and recommendation systems.
 chunks = [chunk.strip() for chunk in sample_document.split('.') if chunk.strip()]
 print("Chunks:", chunks)
 
-# Initialize the embedding model (e.g., all-MiniLM-L6-v2 for lightweight embeddings)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-
-# Generate embeddings for the chunks
-embeddings = embedding_model.encode(chunks, convert_to_tensor=False).tolist()
+# Initialize the embedding service (e.g., all-MiniLM-L6-v2 for lightweight embeddings).
+# The model is loaded once and shared by inserts, queries and the collection's embedding function;
+# vectors go through the on-disk cache shared by the RAG scripts, so only new chunks reach the model
+embedding_cache = EmbeddingCache("embedding_cache.sqlite", max_entries=5_000_000)
+embedding_service = EmbeddingService("all-MiniLM-L6-v2", batch_size=256, cache=embedding_cache)
 
 # Initialize Chroma client (persistent storage to a local directory)
 chroma_client = chromadb.PersistentClient(path="./chroma_db")
@@ -25,35 +29,90 @@ chroma_client = chromadb.PersistentClient(path="./chroma_db")
 collection_name = "sample_collection"
 collection = chroma_client.get_or_create_collection(
     name=collection_name,
-    embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="all-MiniLM-L6-v2"
-    )
+    embedding_function=embedding_service  # Same model instance, no second copy in memory
 )
 
+# Lexical BM25 index over the same chunk IDs, saved next to the collection (see bm25_index.py). It is reused
+# only if it mirrors the collection's current ingest counter; otherwise the collection was written without it
+# (another script, a crash) and the index is rebuilt from the collection's contents
+ingest_counters = "./chroma_db/ingest_counters.json"
+lexical_dir = os.path.join("./chroma_db", f"bm25_{collection_name}")
+lexical_index = None
+if os.path.exists(os.path.join(lexical_dir, "index.json")):
+    lexical_index = BM25Index.load(lexical_dir)
+if lexical_index is None or lexical_index.version != ingest_counter(ingest_counters, collection_name):
+    lexical_index = BM25Index.from_collection(collection)
+
 # Prepare data for insertion
 # Each chunk needs an ID, embedding, and optional metadata
 ids = [f"chunk_{i}" for i in range(len(chunks))]
-metadatas = [{"text": chunk} for chunk in chunks]  # Store original text as metadata
+metadatas = [{"text": chunk, "source": "sample_document"} for chunk in chunks]  # Original text and its source
 
-# Insert chunks into Chroma
-collection.add(
-    ids=ids,
-    embeddings=embeddings,
-    metadatas=metadatas
+# Insert chunks into Chroma: encoded as float32 arrays and upserted in large batches, so re-added IDs replace
+# their text and embedding
+add_to_collection(
+    collection,
+    embedding_service,
+    ids,
+    chunks,
+    metadatas,
+    add_batch_size=5000,
+    max_batch_size=chroma_client.get_max_batch_size()
 )
+# Updated together with the collection: re-added IDs replace their text here too
+lexical_index.add(ids, chunks)
+# Every write to the collection bumps its ingest counter, the version cached answers and the lexical index are
+# tied to
+lexical_index.version = bump_ingest_counter(ingest_counters, collection_name)
+lexical_index.save(lexical_dir)
 
 # Verify insertion by querying the collection
 print(f"Inserted {collection.count()} documents into the collection.")
 
+# Hybrid query: the fetch_k best dense (Chroma) and BM25 matches fused with reciprocal rank fusion,
+# returned in the same shape as collection.query()
+def hybrid_query(query_text, query_embeddings, n_results=2, fetch_k=20):
+    dense = collection.query(query_embeddings=query_embeddings, n_results=min(fetch_k, collection.count()))
+    fused = reciprocal_rank_fusion([dense["ids"][0], [key for key, _ in lexical_index.search(query_text, fetch_k)]])
+    top_ids = [key for key, _ in fused[:n_results]]
+    found = collection.get(ids=top_ids, include=["metadatas"])
+    metadata_by_id = dict(zip(found["ids"], found["metadatas"]))
+    dense_distances = dict(zip(dense["ids"][0], dense["distances"][0]))
+    return {
+        "ids": [top_ids],
+        "distances": [[dense_distances.get(key, float("nan")) for key in top_ids]],
+        "metadatas": [[metadata_by_id[key] for key in top_ids]],
+    }
+
+
 # Example: Query the vector store for similar chunks
 query_text = "What are vector databases?"
-query_embedding = embedding_model.encode([query_text]).tolist()[0]
-results = collection.query(
-    query_embeddings=[query_embedding],
-    n_results=2  # Return top 2 similar chunks
+query_embeddings = embedding_service.encode([query_text])  # (1, dim) float32 array
+
+# Answer cache: the same (or a reworded) question reuses the earlier results; the query embedding above drives
+# the semantic tier, and a change in the collection's contents invalidates every cached answer (see answer_cache.py)
+answer_cache = AnswerCache(threshold=0.95, ttl=3600, max_entries=10_000)
+answer_cache.set_version(ingest_counter(ingest_counters, collection_name))
+results = cached_answer(
+    answer_cache,
+    query_text,
+    query_embeddings[0],
+    lambda: hybrid_query(query_text, query_embeddings, n_results=2)  # Return top 2 chunks
+)
+
+# Search only within selected sources: Chroma pre-filters on its metadata index before scoring
+filtered_results = collection.query(
+    query_embeddings=query_embeddings,
+    n_results=2,
+    where={"source": {"$in": ["sample_document"]}}
 )
+print("Filtered IDs:", filtered_results["ids"][0])
 
 # Print query results
 print("\nQuery Results:")
 for i, (id, distance, metadata) in enumerate(zip(results['ids'][0], results['distances'][0], results['metadatas'][0])):
     print(f"Result {i+1}: ID={id}, Distance={distance:.4f}, Text={metadata['text']}")
+
+# Cache effectiveness for this run
+print("Answer cache:", answer_cache.stats())
+print("Embedding cache:", embedding_cache.stats())
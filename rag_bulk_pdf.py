@@ -5,51 +5,114 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import FAISS
 from langchain.embeddings import OpenAIEmbeddings
 import os
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from faiss_mmap_store import load_mmap_store, write_columnar_docstore
+from attribute_index import AttributeIndex, filtered_search
+from bm25_index import LEXICAL_INDEX_DIR, BM25Index, hybrid_search, load_lexical_index
 
 # Initialize embeddings
 embeddings = OpenAIEmbeddings(openai_api_key="your-openai-api-key")
 
-# Initialize an empty FAISS vector store
-vector_store = None
+# Route every embedding call through the on-disk cache shared by the RAG scripts:
+# chunks that were embedded before (in any run, by any script) never reach the model again
+embedding_cache = EmbeddingCache("embedding_cache.sqlite", max_entries=5_000_000)
+embeddings = CachedEmbeddings(embeddings, embedding_cache)
 
-# Process PDFs in batches
+# Ingestion mode:
+#   "parallel" - parse and chunk PDFs on a process pool and checkpoint a per-file manifest in faiss_index,
+#                so a restarted run skips every PDF that is already indexed and a nightly re-index only
+#                embeds new or changed pages and deletes the vectors of removed ones (see rag_ingest.py)
+#   "batch"    - the original serial loop over fixed batches of PDFs
+ingest_mode = "parallel"
 directory_path = "./pdfs"
-batch_size = 2  # Process 2 PDFs at a time
-pdf_files = [f for f in os.listdir(directory_path) if f.endswith(".pdf")]
 
-for i in range(0, len(pdf_files), batch_size):
-    batch_files = pdf_files[i:i + batch_size]
-    print(f"Processing batch {i // batch_size + 1}: {batch_files}")
+# Chunk sizing for the parallel mode: "characters" (chunk_size=200, chunk_overlap=50 characters) or "tokens"
+# (chunk_size/chunk_overlap in tokens of the embedding model, so every embedding input has a predictable length)
+chunking = "characters"
 
-    # Load batch of PDFs
-    batch_loader = PyPDFDirectoryLoader(
-        path=directory_path,
-        glob=",".join(batch_files)  # Load only specific files
-    )
-    documents = batch_loader.load()
-
-    # Split into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=200,
-        chunk_overlap=50,
-        length_function=len,
-        add_start_index=True
+# Drop exact and near-duplicate chunks (repeated headers, footers, boilerplate pages, duplicated files)
+# before they are embedded; the savings are printed at the end of the run (see chunk_dedup.py)
+deduplicate = True
+
+# FAISS index type for the parallel mode: "flat" (exact), "sq8", "hnsw", "ivfsq8", "ivfpq" or "opqivfpq".
+# Approximate kinds are trained on a sample of the stored vectors (see faiss_index_factory.py);
+# "ivfpq" keeps queries in the millisecond range at tens of millions of chunks on a CPU-only box
+index_kind = "flat"
+
+if ingest_mode == "parallel":
+    from chunk_dedup import ChunkDeduplicator
+    from rag_ingest import ingest_directory
+
+    vector_store = ingest_directory(
+        directory_path,
+        embeddings,
+        index_dir="faiss_index",
+        embed_batch_size=256,  # Chunks per embedding call
+        checkpoint_every=500,  # Save index + manifest every 500 PDFs
+        chunking=chunking,
+        chunk_size=256 if chunking == "tokens" else 200,
+        chunk_overlap=32 if chunking == "tokens" else 50,
+        dedup=ChunkDeduplicator(threshold=0.85) if deduplicate else None,
+        index_kind=index_kind,
+        text_cache="pdf_text_cache.sqlite"  # parsed page text is reused across runs and scripts (pdf_text_cache.py)
     )
-    chunked_documents = text_splitter.split_documents(documents)
+else:
+    # Initialize an empty FAISS vector store
+    vector_store = None
+
+    # Process PDFs in batches
+    batch_size = 2  # Process 2 PDFs at a time
+    pdf_files = [f for f in os.listdir(directory_path) if f.endswith(".pdf")]
+
+    for i in range(0, len(pdf_files), batch_size):
+        batch_files = pdf_files[i:i + batch_size]
+        print(f"Processing batch {i // batch_size + 1}: {batch_files}")
 
-    # Create or merge FAISS vector store
-    if vector_store is None:
-        vector_store = FAISS.from_documents(chunked_documents, embeddings)
-    else:
-        new_vector_store = FAISS.from_documents(chunked_documents, embeddings)
-        vector_store.merge_from(new_vector_store)
+        # Load batch of PDFs
+        batch_loader = PyPDFDirectoryLoader(
+            path=directory_path,
+            glob=",".join(batch_files)  # Load only specific files
+        )
+        documents = batch_loader.load()
 
-# Save the vector store
-vector_store.save_local("faiss_index")
+        # Split into chunks
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=200,
+            chunk_overlap=50,
+            length_function=len,
+            add_start_index=True
+        )
+        chunked_documents = text_splitter.split_documents(documents)
+
+        # Create or merge FAISS vector store
+        if vector_store is None:
+            vector_store = FAISS.from_documents(chunked_documents, embeddings)
+        else:
+            new_vector_store = FAISS.from_documents(chunked_documents, embeddings)
+            vector_store.merge_from(new_vector_store)
+
+    # Save the vector store
+    vector_store.save_local("faiss_index")
+    write_columnar_docstore(vector_store, "faiss_index")
+    BM25Index.from_vector_store(vector_store).save(os.path.join("faiss_index", LEXICAL_INDEX_DIR))
+
+# Query workers: memory-map the saved index and its columnar docstore instead of FAISS.load_local, which
+# copies index.faiss into RAM and unpickles every document (see faiss_mmap_store.py). Startup takes seconds
+# and all workers on the host share one copy through the page cache
+vector_store = load_mmap_store("faiss_index", embeddings)
+lexical_index = load_lexical_index("faiss_index")
 
 # Perform a search
 query = "What is deep learning?"
-relevant_docs = vector_store.similarity_search(query, k=3)
+# Hybrid retrieval: the 20 best dense and 20 best BM25 matches fused with reciprocal rank fusion (see bm25_index.py)
+relevant_docs = hybrid_search(vector_store, lexical_index, query, k=3, fetch_k=20)
+
+# Search only within some PDFs: the attribute index (source -> vector positions, see attribute_index.py) restricts
+# the search to their chunks before any distance is computed, instead of over-fetching and post-filtering
+attribute_index = AttributeIndex.load("faiss_index")
+selected_sources = attribute_index.values[:50]
+filtered_docs = filtered_search(vector_store, attribute_index, query, k=3, sources=selected_sources)
+print(f"Found {len(filtered_docs)} relevant documents in {len(selected_sources)} selected PDFs")
 
 # Print results
 print(f"Found {len(relevant_docs)} relevant documents:")
@@ -58,3 +121,6 @@ for i, doc in enumerate(relevant_docs):
     print(f"Source: {doc.metadata['source']}, Page: {doc.metadata['page']}, Start Index: {doc.metadata['start_index']}")
     print(f"Content: {doc.page_content[:100]}...")
     print("-" * 50)
+
+# Embedding cache effectiveness for this run
+print("Embedding cache:", embedding_cache.stats())
@@ -0,0 +1,377 @@
+# Parallel, resumable and incremental PDF ingestion for large directories.
+# PDFs are parsed and chunked on a process pool (one file per task, all cores busy), the resulting chunks are
+# streamed into the embedder in fixed-size batches, and a per-file checkpoint manifest (path, size, mtime,
+# content hash, page hashes -> vector IDs) is written next to the FAISS index.
+# Every run diffs the directory against that manifest:
+#   - unchanged files are skipped (a crash after 40,000 PDFs does not redo those 40,000 PDFs)
+#   - new files are embedded, changed files only have their new or changed pages embedded
+#   - vectors of removed files and of pages that no longer exist are deleted by ID
+# The index and manifest are saved atomically, so a crash mid-save never leaves a half-written index.
+# Install dependencies if not already installed: pip install langchain faiss-cpu pypdf
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.vectorstores import FAISS
+
+from bm25_index import LEXICAL_INDEX_DIR, load_lexical_index
+from faiss_index_factory import INDEX_PARAMS_NAME, apply_params, convert_store, delete_vectors, load_params
+from faiss_mmap_store import write_columnar_docstore
+from file_utils import file_hash, list_pdfs
+from pdf_text_cache import load_pdf_pages, open_text_cache
+
+MANIFEST_NAME = "manifest.json"
+DEDUP_STATE_NAME = "dedup.pkl"
+LEGACY_PAGE_KEY = "legacy"  # page key of manifest entries written before per-page keys
+
+
+# --- 1. File and Page Fingerprints ---
+def file_entry(path, content_hash=None):
+    stat = os.stat(path)
+    return {
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "hash": content_hash or file_hash(path),
+    }
+
+
+def page_key(path, page_number, text):
+    # Pages are keyed by (path, page number, extracted text): the key changes whenever the text of the page
+    # changes or the page moves, so the stored "page" metadata can never go stale
+    return hashlib.sha256(f"{path}\0{page_number}\0{text}".encode()).hexdigest()[:16]
+
+
+# --- 2. Checkpoint Manifest ---
+def load_manifest(index_dir):
+    # Maps path -> {"path", "size", "mtime", "hash", "pages": {page_key: [vector IDs]}};
+    # an empty dict means nothing has been ingested yet
+    recover_index_dir(index_dir)
+    manifest_path = os.path.join(index_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as file:
+        manifest = json.load(file)
+    for entry in manifest.values():
+        if "pages" not in entry:
+            # Written before page keys existed ({..., "ids": [vector IDs]}): all IDs go under one pseudo-page that
+            # no real page key matches, so they are kept while the file is unchanged and deleted once it changes
+            entry["pages"] = {LEGACY_PAGE_KEY: entry.pop("ids", [])}
+    return manifest
+
+
+def is_unchanged(entry, path):
+    # Cheap check first: same size and mtime means the file was not touched since it was ingested
+    if entry is None:
+        return False
+    stat = os.stat(path)
+    return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+
+
+def stale_page_ids(old_entry, new_entry):
+    # Vector IDs of pages that were removed or changed between two manifest entries of the same file
+    new_pages = new_entry["pages"] if new_entry else {}
+    return [
+        vector_id
+        for key, ids in old_entry["pages"].items()
+        if key not in new_pages
+        for vector_id in ids
+    ]
+
+
+# --- 3. Atomic Index Saves ---
+def save_index(vector_store, manifest, index_dir, index_params=None, lexical_index=None, dedup=None, columns=True):
+    # The index and its manifest are written to a sibling directory which is then swapped in, so readers
+    # (and a restarted run) always see a matching index.faiss / index.pkl / manifest.json triple.
+    # index_params.json (see faiss_index_factory.py) is rewritten when given, carried over otherwise.
+    # columns/ (see faiss_mmap_store.py) is rewritten with the index so query workers can memory-map it. Writing it
+    # reads every document, so ingest_directory only asks for it (columns=True) with the last save of a run; the
+    # saves before that leave it out instead of carrying over a copy that no longer matches the index.
+    # bm25/ (see bm25_index.py) is rewritten when a lexical index is given, carried over otherwise.
+    # dedup.pkl (see chunk_dedup.py) is rewritten when a deduplicator is given.
+    tmp_dir = index_dir + ".tmp"
+    old_dir = index_dir + ".old"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    if vector_store is not None:
+        vector_store.save_local(tmp_dir)
+        if columns:
+            write_columnar_docstore(vector_store, tmp_dir)
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as file:
+        json.dump(manifest, file)
+        file.flush()
+        os.fsync(file.fileno())
+    params_path = os.path.join(index_dir, INDEX_PARAMS_NAME)
+    if index_params is not None:
+        with open(os.path.join(tmp_dir, INDEX_PARAMS_NAME), "w") as file:
+            json.dump(index_params, file, indent=2)
+    elif os.path.exists(params_path):
+        shutil.copy2(params_path, tmp_dir)
+    lexical_path = os.path.join(index_dir, LEXICAL_INDEX_DIR)
+    if lexical_index is not None:
+        lexical_index.save(os.path.join(tmp_dir, LEXICAL_INDEX_DIR))
+    elif os.path.exists(lexical_path):
+        shutil.copytree(lexical_path, os.path.join(tmp_dir, LEXICAL_INDEX_DIR))
+    if dedup is not None:
+        dedup.save(os.path.join(tmp_dir, DEDUP_STATE_NAME))
+
+    if os.path.exists(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def recover_index_dir(index_dir):
+    # A crash between the two renames in save_index leaves only the previous index behind, restore it
+    old_dir = index_dir + ".old"
+    if not os.path.exists(index_dir) and os.path.exists(old_dir):
+        os.replace(old_dir, index_dir)
+
+
+# --- 4. Worker: Parse and Chunk One PDF ---
+def make_text_splitter(chunking="characters", chunk_size=200, chunk_overlap=50):
+    # "characters": chunk_size/chunk_overlap count characters (the original RecursiveCharacterTextSplitter setup)
+    # "tokens":     chunk_size/chunk_overlap count tokens of the embedding model's tokenizer (token_text_splitter.py)
+    if chunking == "tokens":
+        from token_text_splitter import TokenTextChunker
+
+        return TokenTextChunker(chunk_tokens=chunk_size, overlap_tokens=chunk_overlap)
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        add_start_index=True
+    )
+
+
+def parse_and_chunk(path, chunk_size=200, chunk_overlap=50, known=None, chunking="characters", text_cache=None):
+    # Runs inside a worker process. known is the previous manifest entry of the file (or None).
+    # text_cache: path of an extracted-text cache (pdf_text_cache.py); pages of a file content that was parsed
+    # before are read back from it instead of being parsed again.
+    # Returns (entry, chunks) where chunks is a list of (vector ID, Document) for new or changed pages only.
+    # Page keys do not include the chunking settings: changing them needs a fresh index_dir.
+    content_hash = file_hash(path)
+    entry = file_entry(path, content_hash)
+    known_pages = known["pages"] if known else {}
+    if known is not None and known["hash"] == content_hash:
+        # Only touched (mtime changed): the content, and therefore every page, is unchanged
+        entry["pages"] = known_pages
+        return entry, []
+
+    entry["pages"] = {}
+    new_pages = []  # pages that need embedding
+    page_keys = {}  # page number -> page key
+    for page in load_pdf_pages(path, open_text_cache(text_cache) if text_cache else None, content_hash):
+        key = page_key(path, page.metadata["page"], page.page_content)
+        if key in known_pages:
+            entry["pages"][key] = known_pages[key]
+        else:
+            entry["pages"][key] = []
+            page_keys[page.metadata["page"]] = key
+            new_pages.append(page)
+
+    # All new pages of the file are split in one call (the token splitter tokenizes them as one batch)
+    text_splitter = make_text_splitter(chunking, chunk_size, chunk_overlap)
+    chunks = []
+    for chunk in text_splitter.split_documents(new_pages):
+        key = page_keys[chunk.metadata["page"]]
+        vector_id = f"{key}-{len(entry['pages'][key])}"
+        entry["pages"][key].append(vector_id)
+        chunks.append((vector_id, chunk))
+    return entry, chunks
+
+
+# --- 5. Parallel, Incremental Ingestion with Checkpoints ---
+def load_vector_store(index_dir, embeddings):
+    recover_index_dir(index_dir)
+    if not os.path.exists(os.path.join(index_dir, "index.faiss")):
+        return None
+    vector_store = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    apply_params(vector_store, index_dir)
+    return vector_store
+
+
+def add_chunks(vector_store, documents, ids, embeddings):
+    # Create the store on the first batch, append to it afterwards
+    if vector_store is None:
+        return FAISS.from_documents(documents, embeddings, ids=ids)
+    vector_store.add_documents(documents, ids=ids)
+    return vector_store
+
+
+def delete_chunks(vector_store, ids):
+    if vector_store is None or not ids:
+        return
+    existing = set(vector_store.index_to_docstore_id.values())
+    ids = [vector_id for vector_id in ids if vector_id in existing]
+    if ids:
+        # Also keeps IVF labels in step with LangChain's renumbering
+        delete_vectors(vector_store, ids)
+
+
+def stored_chunks(vector_store):
+    for vector_id in vector_store.index_to_docstore_id.values():
+        document = vector_store.docstore.search(vector_id)
+        if not isinstance(document, str):  # InMemoryDocstore returns an error string for unknown IDs
+            yield vector_id, document.page_content
+
+
+def load_dedup_state(dedup, index_dir, vector_store):
+    # The deduplicator of an index lives in index_dir/dedup.pkl: it knows every kept chunk and which dropped
+    # chunk duplicates which kept chunk. An index that was built without it is seeded once from its stored
+    # chunks. Without a deduplicator argument an index that has dedup.pkl keeps being deduplicated with its
+    # saved parameters, otherwise the duplicates of deleted chunks would never be embedded.
+    state_path = os.path.join(index_dir, DEDUP_STATE_NAME)
+    if os.path.exists(state_path):
+        if dedup is None:
+            from chunk_dedup import ChunkDeduplicator
+
+            with open(state_path, "rb") as file:
+                dedup = ChunkDeduplicator(**pickle.load(file)["params"])
+        dedup.load_state(state_path)
+    elif dedup is not None and vector_store is not None:
+        dedup.seed(stored_chunks(vector_store))
+    return dedup
+
+
+def ingest_directory(
+    directory_path,
+    embeddings,
+    index_dir="faiss_index",
+    max_workers=None,
+    embed_batch_size=256,
+    checkpoint_every=500,
+    chunk_size=200,
+    chunk_overlap=50,
+    chunking="characters",
+    dedup=None,
+    index_kind="flat",
+    lexical=True,
+    text_cache=None,
+):
+    # dedup: optional chunk_dedup.ChunkDeduplicator; exact and near-duplicate chunks are dropped before embedding.
+    # A dropped chunk keeps its vector ID in the manifest and is embedded once the chunk it duplicates is deleted.
+    # index_kind: "flat", "sq8", "hnsw", "ivfsq8", "ivfpq" or "opqivfpq" (see faiss_index_factory.py); the index
+    # is converted (quantizers trained on a sample) once, later runs add to the trained index. HNSW graphs cannot
+    # delete: a run that may delete vectors from one works on a flat copy and rebuilds the graph at the end.
+    # text_cache: optional extracted-text cache file shared with the loaders, e.g. "pdf_text_cache.sqlite"
+    # lexical: keep a BM25 index of the same chunk IDs in index_dir/bm25 for hybrid retrieval (see bm25_index.py)
+    manifest = load_manifest(index_dir)
+    vector_store = load_vector_store(index_dir, embeddings)
+    lexical_index = load_lexical_index(index_dir, vector_store) if lexical else None
+
+    pdf_paths = list_pdfs(directory_path)
+    on_disk = set(pdf_paths)
+    removed = [path for path in manifest if path not in on_disk]
+    pending = [path for path in pdf_paths if not is_unchanged(manifest.get(path), path)]
+    print(
+        f"{len(pdf_paths) - len(pending)} PDFs unchanged, {len(pending)} new or modified, "
+        f"{len(removed)} removed"
+    )
+
+    dedup = load_dedup_state(dedup, index_dir, vector_store)
+
+    index_params = None  # written with the next checkpoint
+    if (
+        vector_store is not None
+        and load_params(index_dir)["kind"] == "hnsw"
+        and (removed or any(path in manifest for path in pending))
+    ):
+        index_params = convert_store(vector_store, "flat")
+        print(f"{index_dir} is an HNSW index: deleting from a flat copy, the graph is rebuilt at the end")
+
+    # Vectors of removed files are deleted with the first flush, their entries leave the manifest with it
+    stale_ids = [vector_id for path in removed for vector_id in stale_page_ids(manifest.pop(path), None)]
+    stats = {"embedded": 0, "deleted": 0}
+
+    batch_documents, batch_ids = [], []
+    completed = []  # manifest entries whose chunks are embedded but not yet checkpointed
+    files_since_checkpoint = 0
+
+    def queue_chunk(vector_id, document):
+        if dedup is not None:
+            kind, canonical_id = dedup.classify(document.page_content, vector_id)
+            if kind is not None:
+                dedup.add_duplicate(vector_id, canonical_id, document)
+                return
+        batch_ids.append(vector_id)
+        batch_documents.append(document)
+
+    def flush():
+        nonlocal vector_store, batch_documents, batch_ids, stale_ids
+        if dedup is not None:
+            # Duplicates of deleted chunks take their place (or become duplicates of another kept chunk)
+            for vector_id, document in dedup.forget(stale_ids):
+                queue_chunk(vector_id, document)
+        delete_chunks(vector_store, stale_ids)
+        stats["deleted"] += len(stale_ids)
+        if batch_documents:
+            vector_store = add_chunks(vector_store, batch_documents, batch_ids, embeddings)
+            stats["embedded"] += len(batch_documents)
+        if lexical_index is not None:
+            lexical_index.delete(stale_ids)
+            lexical_index.add(batch_ids, (document.page_content for document in batch_documents))
+        batch_documents, batch_ids, stale_ids = [], [], []
+
+    def checkpoint(final=False):
+        nonlocal completed, files_since_checkpoint, index_params
+        flush()
+        for entry in completed:
+            manifest[entry["path"]] = entry
+        save_index(vector_store, manifest, index_dir, index_params, lexical_index, dedup, columns=final)
+        index_params = None
+        print(f"Checkpoint: {len(manifest)} PDFs in {index_dir}")
+        completed, files_since_checkpoint = [], 0
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # Keep a bounded number of files in flight, so parsed chunks never pile up faster than they are embedded
+        max_in_flight = 2 * max_workers
+        queue = iter(pending)
+        in_flight = set()
+
+        def submit_next():
+            path = next(queue, None)
+            if path is None:
+                return False
+            in_flight.add(pool.submit(
+                parse_and_chunk, path, chunk_size, chunk_overlap, manifest.get(path), chunking, text_cache
+            ))
+            return True
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry, chunks = future.result()
+                known = manifest.get(entry["path"])
+                if known is not None:
+                    stale_ids.extend(stale_page_ids(known, entry))
+                for vector_id, document in chunks:
+                    queue_chunk(vector_id, document)
+                if len(batch_documents) >= embed_batch_size:
+                    flush()
+                completed.append(entry)
+                files_since_checkpoint += 1
+                if files_since_checkpoint >= checkpoint_every:
+                    checkpoint()
+                submit_next()
+
+    # The columnar docstore is written once, with the last save of the run
+    converting = vector_store is not None and (index_params or load_params(index_dir))["kind"] != index_kind
+    checkpoint(final=not converting)
+    print(f"Embedded {stats['embedded']} chunks, deleted {stats['deleted']} stale vectors")
+    if converting:
+        index_params = convert_store(vector_store, index_kind)
+        save_index(vector_store, manifest, index_dir, index_params, lexical_index, dedup)
+        print(f"Converted {index_dir} to {index_params['spec']}")
+    if dedup is not None:
+        print(dedup.report())
+    return vector_store
@@ -0,0 +1,251 @@
+# Batched, concurrent query serving for the RAG chain.
+# qa_chain({"query": ...}) answers one question at a time: embed the question, search k=3, call the LLM and wait,
+# so throughput is capped at about one question per LLM round-trip. QueryServer answers the same way (same
+# "stuff" prompt, same {"result", "source_documents"} output) but
+#   - micro-batches questions that arrive within max_wait_ms into one embedding call and one index search (faiss
+#     searches the whole batch in a single vectorized call); the batch is embedded with embed_documents, or with
+#     the embed_queries hook (list of questions -> list of vectors) for asymmetric models (e5, bge, instructor)
+#     whose questions need a query-side instruction,
+#   - runs the LLM calls of all pending questions concurrently, bounded by a semaphore (max_concurrent_llm),
+#   - answers repeated and reworded questions from an optional AnswerCache (answer_cache.py) before searching,
+#     with the query embedding it computes anyway driving the semantic tier,
+#   - records per-stage latencies (queue, retrieve, llm, total) and reports p50/p99.
+# The LLM is any async callable prompt -> answer: ChatModelLLM wraps a LangChain chat model, StubLLM answers
+# locally after a fixed delay for load runs without an API key.
+# Install dependencies if not already installed: pip install langchain faiss-cpu numpy
+
+import asyncio
+import time
+from collections import deque
+
+import faiss
+import numpy as np
+
+# Default prompt of RetrievalQA.from_chain_type(chain_type="stuff")
+PROMPT_TEMPLATE = (
+    "Use the following pieces of context to answer the question at the end. If you don't know the answer, "
+    "just say that you don't know, don't try to make up an answer.\n\n{context}\n\nQuestion: {question}\n"
+    "Helpful Answer:"
+)
+
+
+# --- 1. LLM Backends ---
+class ChatModelLLM:
+    # Adapts a LangChain chat model (e.g. ChatOpenAI) to an async prompt -> answer callable
+    def __init__(self, chat_model):
+        self.chat_model = chat_model
+
+    async def __call__(self, prompt):
+        message = await self.chat_model.ainvoke(prompt)
+        return getattr(message, "content", message)
+
+
+class StubLLM:
+    # Local stand-in for the LLM: waits delay seconds (a simulated round-trip) and echoes the question
+    def __init__(self, delay=0.5):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        question = prompt.rsplit("Question: ", 1)[-1].split("\n", 1)[0]
+        return f"Stub answer to: {question}"
+
+
+# --- 2. Latency Metrics ---
+class LatencyMetrics:
+    # Keeps the last `window` latencies of every stage (in milliseconds)
+    def __init__(self, window=10_000):
+        self.window = window
+        self.samples = {}
+        self.batch_sizes = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.completed = 0
+
+    def record(self, stage, seconds):
+        self.samples.setdefault(stage, deque(maxlen=self.window)).append(seconds * 1000)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        stages = {
+            stage: {
+                "p50_ms": float(np.percentile(values, 50)),
+                "p99_ms": float(np.percentile(values, 99)),
+                "count": len(values),
+            }
+            for stage, values in self.samples.items()
+            if values
+        }
+        return {
+            "stages": stages,
+            "completed": self.completed,
+            "qps": self.completed / elapsed if elapsed else 0.0,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+        }
+
+    def report(self):
+        summary = self.summary()
+        lines = [
+            f"{summary['completed']} queries, {summary['qps']:.1f} QPS, "
+            f"mean retrieval batch {summary['mean_batch_size']:.1f}"
+        ]
+        for stage, values in summary["stages"].items():
+            lines.append(f"  {stage:<9} p50 {values['p50_ms']:>9.1f} ms   p99 {values['p99_ms']:>9.1f} ms")
+        return "\n".join(lines)
+
+
+# --- 3. Query Server ---
+class QueryServer:
+    def __init__(self, vector_store, embeddings, llm, k=3, max_batch_size=32, max_wait_ms=5, max_concurrent_llm=8,
+                 answer_cache=None, embed_queries=None):
+        # answer_cache: optional answer_cache.AnswerCache; set its version (index_version) before serving
+        # embed_queries: optional batched query embedding for asymmetric models, e.g. a function that prefixes every
+        # question with "query: " and calls embed_documents once
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.llm = llm
+        self.k = k
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_llm = max_concurrent_llm
+        self.answer_cache = answer_cache
+        self.embed_queries = embed_queries or embeddings.embed_documents
+        self.metrics = LatencyMetrics()
+        self.queue = None
+        self.semaphore = None
+        self.batcher = None
+        self.llm_tasks = set()
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.semaphore = asyncio.Semaphore(self.max_concurrent_llm)
+        self.batcher = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        # Lets queued questions and running LLM calls finish, then stops the batcher
+        await self.queue.join()
+        if self.llm_tasks:
+            await asyncio.gather(*self.llm_tasks, return_exceptions=True)
+        self.batcher.cancel()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def ask(self, question):
+        # Returns {"query", "result", "source_documents"} like qa_chain({"query": question})
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((question, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self):
+        # Waits for one question, then collects more until the batch is full or max_wait has passed
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            dispatched = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.metrics.record("queue", dispatched - enqueued)
+            self.metrics.batch_sizes.append(len(batch))
+            try:
+                # Embedding and faiss search block (and release the GIL); keep them off the event loop
+                vectors = await loop.run_in_executor(None, self.embed, [question for question, _, _ in batch])
+                misses = [row for row, (question, future, enqueued) in enumerate(batch)
+                          if not self._answer_from_cache(question, vectors[row], future, enqueued)]
+                documents = await loop.run_in_executor(None, self.search, vectors[misses]) if misses else []
+            except Exception as error:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+            else:
+                self.metrics.record("retrieve", time.perf_counter() - dispatched)
+                for row, docs in zip(misses, documents):
+                    question, future, enqueued = batch[row]
+                    task = asyncio.create_task(self._answer(question, docs, future, enqueued, vectors[row]))
+                    self.llm_tasks.add(task)
+                    task.add_done_callback(self.llm_tasks.discard)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def embed(self, questions):
+        # One embedding call for the whole micro-batch
+        return np.asarray(self.embed_queries(questions), dtype=np.float32)
+
+    def search(self, vectors):
+        # One index search for the whole batch; returns the top-k documents per query vector
+        vectors = np.array(vectors, dtype=np.float32)  # a copy: normalize_L2 works in place
+        if getattr(self.vector_store, "_normalize_L2", False):
+            faiss.normalize_L2(vectors)
+        _, positions = self.vector_store.index.search(vectors, self.k)
+        index_to_docstore_id = self.vector_store.index_to_docstore_id
+        docstore = self.vector_store.docstore
+        return [
+            [docstore.search(index_to_docstore_id[position]) for position in row if position != -1]
+            for row in positions
+        ]
+
+    def retrieve(self, questions):
+        return self.search(self.embed(questions))
+
+    def _answer_from_cache(self, question, vector, future, enqueued):
+        # True if the answer cache answered the question
+        if self.answer_cache is None:
+            return False
+        tier, value = self.answer_cache.lookup(question, vector)
+        if tier is None:
+            return False
+        self.metrics.record("total", time.perf_counter() - enqueued)
+        self.metrics.completed += 1
+        if not future.done():
+            future.set_result(value)
+        return True
+
+    async def _answer(self, question, documents, future, enqueued, vector=None):
+        context = "\n\n".join(document.page_content for document in documents)
+        prompt = PROMPT_TEMPLATE.format(context=context, question=question)
+        try:
+            async with self.semaphore:
+                start = time.perf_counter()
+                answer = await self.llm(prompt)
+                self.metrics.record("llm", time.perf_counter() - start)
+        except Exception as error:
+            if not future.done():
+                future.set_exception(error)
+            return
+        self.metrics.record("total", time.perf_counter() - enqueued)
+        self.metrics.completed += 1
+        result = {"query": question, "result": answer, "source_documents": documents}
+        if self.answer_cache is not None:
+            self.answer_cache.store(question, result, vector)
+        if not future.done():
+            future.set_result(result)
+
+
+# --- 4. Load Test ---
+async def run_load_test(server, questions, concurrency=64):
+    # Sends the questions with at most `concurrency` in flight; returns the results in order
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def one(question):
+        async with limiter:
+            return await server.ask(question)
+
+    return await asyncio.gather(*(one(question) for question in questions))
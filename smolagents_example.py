@@ -172,35 +172,37 @@ print(result)
 # Example 3: Voice-Driven Task with Whisper Integration
 # Scenario: You want to transcribe a spoken command (“Search for flights to Tokyo next month”) using Whisper v3, then use CodeAgent to fetch flight data from an API (e.g., Skyscanner API mock).
 
-from transformers import pipeline
+from transcription_service import load_asr_pipeline
+from trace_exporter import LangfuseSender, TraceExporter
 from smolagents import CodeAgent, HfApiModel
 import torch
 
-# Initialize Whisper for transcription
-device = "cuda" if torch.cuda.is_available() else "cpu"
-whisper = pipeline("automatic-speech-recognition", model="openai/whisper-large-v3", device=device)
-
-# Initialize CodeAgent
-model = HfApiModel(model_id="mistralai/Mixtral-8x7B-Instruct-v0.1")
-agent = CodeAgent(tools=[FlightSearchTool()], model=model)
-
-# Transcribe audio
+# Traces go to Langfuse in batches from a background thread, off the request path (see trace_exporter.py);
+# LangfuseSender reads LANGFUSE_HOST, LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY
+exporter = TraceExporter(LangfuseSender(), overflow="spill")
 audio = "flight_query.wav"
-transcription = whisper(audio, generate_kwargs={"task": "transcribe", "language": "english"})
-task = transcription["text"]
-
-# Run CodeAgent
-result = agent.run(task)
 
-# Log to Langfuse
-from langfuse import get_client
-langfuse = get_client()
-langfuse.trace(
-    name="voice_flight_search",
-    input=task,
-    output=result,
-    metadata={"audio": "flight_query.wav", "tool": "FlightSearchTool"}
-)
+with exporter.start_trace("voice_flight_search", metadata={"audio": audio, "tool": "FlightSearchTool"}) as trace:
+    # Initialize Whisper for transcription (cached per process, see transcription_service.py)
+    with trace.span("load"):
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        whisper = load_asr_pipeline("openai/whisper-large-v3", device)
+
+    # Initialize CodeAgent
+    model = HfApiModel(model_id="mistralai/Mixtral-8x7B-Instruct-v0.1")
+    agent = CodeAgent(tools=[FlightSearchTool()], model=model)
+
+    # Transcribe audio
+    with trace.span("inference"):
+        transcription = whisper(audio, generate_kwargs={"task": "transcribe", "language": "english"})
+    with trace.span("postprocess"):
+        task = transcription["text"].strip()
+    trace.input = task
+
+    # Run CodeAgent
+    with trace.span("agent"):
+        result = agent.run(task)
+    trace.output = result
 
 # Output
 print(result)  # op : Cheapest flight to Tokyo: ANA, $750, March 1, 2026
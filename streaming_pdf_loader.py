@@ -0,0 +1,174 @@
+# Lazy, page-streaming PDF loading on a process pool.
+# PyPDFDirectoryLoader(path).load() parses every page of every PDF on one core and returns them all as one list,
+# so memory grows with the directory and one pathological PDF stalls the whole batch. StreamingPDFLoader yields
+# the same Documents (page_content = page.extract_text(), metadata {"source": path, "page": page_number}) as
+# soon as worker processes extract them:
+#   - one file per worker at a time, paths are taken lazily from the directory walk
+#   - every worker sends its pages over its own pipe; pipes are bounded OS buffers, so workers block when the
+#     consumer is slower than extraction and memory stays bounded by max_workers files, whatever the directory size
+#   - a file whose worker sends nothing for file_timeout seconds (or crashes) is abandoned: the worker is killed,
+#     replaced, and loader.failed records (path, pages_yielded, reason). Time the consumer spends between two
+#     Documents does not count: workers are only blocked on their pipe then.
+# Pages of one file arrive in order; pages of different files are interleaved. An abandoned file has yielded its
+# first pages_yielded pages.
+# Install dependencies if not already installed: pip install langchain pypdf
+
+import os
+import time
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+from pathlib import Path
+
+from langchain.schema import Document
+
+
+# --- 1. Worker Process ---
+def extract_pages(tasks, results, cache_path=None):
+    # Receives file paths until None, sends ("page", page_number, text) per page, then ("done", page_count)
+    # or ("error", reason). With cache_path, pages come from the extracted-text cache when the file content was
+    # parsed before (see pdf_text_cache.py) and freshly parsed files are added to it.
+    from file_utils import file_hash
+    from pdf_text_cache import PDFTextCache, iter_pypdf_pages, loader_version
+
+    cache = PDFTextCache(cache_path) if cache_path else None
+    loader = loader_version("StreamingPDFLoader")
+    while True:
+        path = tasks.recv()
+        if path is None:
+            break
+        try:
+            content_hash = file_hash(path) if cache else None
+            pages = cache.get(content_hash, loader) if cache else None
+            if pages is None:
+                pages = []
+                for metadata, text in iter_pypdf_pages(path):
+                    results.send(("page", metadata["page"], text))
+                    pages.append((metadata, text))
+                if cache:
+                    cache.put(content_hash, loader, pages)
+            else:
+                for metadata, text in pages:
+                    results.send(("page", metadata["page"], text))
+            results.send(("done", len(pages)))
+        except Exception as error:
+            results.send(("error", f"{type(error).__name__}: {error}"))
+    if cache:
+        cache.close()
+
+
+class _Worker:
+    def __init__(self, cache_path=None):
+        task_reader, self.tasks = Pipe(duplex=False)
+        self.results, result_writer = Pipe(duplex=False)
+        self.process = Process(target=extract_pages, args=(task_reader, result_writer, cache_path), daemon=True)
+        self.process.start()
+        task_reader.close()
+        result_writer.close()
+        self.path = None
+        self.last_message = None  # loader clock time of the last message received for the current file
+        self.pages_yielded = 0
+
+    def assign(self, path, now):
+        self.path = path
+        self.last_message = now
+        self.pages_yielded = 0
+        self.tasks.send(path)
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.tasks.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.tasks.close()
+        self.results.close()
+
+
+# --- 2. Streaming Loader ---
+class StreamingPDFLoader:
+    def __init__(
+        self, path, glob="**/[!.]*.pdf", recursive=False, max_workers=None, file_timeout=120, cache_path=None
+    ):
+        # path/glob/recursive select files like PyPDFDirectoryLoader; file_timeout: seconds a file may go without
+        # producing a page;
+        # cache_path: optional extracted-text cache (pdf_text_cache.py), e.g. "pdf_text_cache.sqlite"
+        self.path = path
+        self.cache_path = cache_path
+        self.glob = glob
+        self.recursive = recursive
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.file_timeout = file_timeout
+        self.failed = []  # (path, pages_yielded, reason) of files that were abandoned or failed to parse
+        self.stats = {"files": 0, "pages": 0}
+        self._paused = 0.0  # seconds spent suspended in yield, excluded from the timeout clock
+
+    def _clock(self):
+        return time.monotonic() - self._paused
+
+    def iter_paths(self):
+        directory = Path(self.path)
+        matches = directory.rglob(self.glob) if self.recursive else directory.glob(self.glob)
+        for path in matches:
+            if path.is_file():
+                yield str(path)
+
+    def lazy_load(self):
+        paths = self.iter_paths()
+        workers = [_Worker(self.cache_path) for _ in range(self.max_workers)]
+        try:
+            for worker in workers:
+                self._assign_next(worker, paths)
+            while any(worker.path is not None for worker in workers):
+                busy = {worker.results: worker for worker in workers if worker.path is not None}
+                deadline = min(worker.last_message for worker in busy.values()) + self.file_timeout
+                for connection in wait(list(busy), timeout=max(0.0, deadline - self._clock())):
+                    worker = busy[connection]
+                    try:
+                        message = connection.recv()
+                    except EOFError:  # the worker process died (e.g. a crash inside the PDF parser)
+                        workers[workers.index(worker)] = self._replace(worker, paths, "worker process died")
+                        continue
+                    worker.last_message = self._clock()
+                    if message[0] == "page":
+                        _, page_number, text = message
+                        worker.pages_yielded += 1
+                        self.stats["pages"] += 1
+                        suspended = time.monotonic()
+                        yield Document(page_content=text, metadata={"source": worker.path, "page": page_number})
+                        self._paused += time.monotonic() - suspended
+                    else:
+                        if message[0] == "error":
+                            self.failed.append((worker.path, worker.pages_yielded, message[1]))
+                        else:
+                            self.stats["files"] += 1
+                        self._assign_next(worker, paths)
+                now = self._clock()
+                for position, worker in enumerate(workers):
+                    if worker.path is not None and now - worker.last_message > self.file_timeout:
+                        workers[position] = self._replace(worker, paths, f"no progress for {self.file_timeout}s")
+        finally:
+            for worker in workers:
+                worker.stop(kill=worker.path is not None)
+
+    def _assign_next(self, worker, paths):
+        path = next(paths, None)
+        worker.path = None
+        if path is not None:
+            worker.assign(path, self._clock())
+
+    def _replace(self, worker, paths, reason):
+        # The abandoned file is reported with the number of its pages already yielded
+        self.failed.append((worker.path, worker.pages_yielded, reason))
+        worker.stop(kill=True)
+        replacement = _Worker(self.cache_path)
+        self._assign_next(replacement, paths)
+        return replacement
+
+    def load(self):
+        return list(self.lazy_load())
@@ -0,0 +1,181 @@
+# Streaming, bounded-memory text splitter.
+# RecursiveCharacterTextSplitter.create_documents needs the whole document as one in-memory string; for
+# multi-hundred-MB extracted texts that spikes memory. StreamingTextSplitter reads a file or an iterator of strings
+# in fixed-size windows and yields chunks as it goes, with the same output and start_index metadata as
+#     RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=50, length_function=len,
+#                                    separators=["\n\n", "\n", " ", ""], add_start_index=True)
+# The stream is cut into paragraphs ("\n\n") by a single linear scan; only a paragraph longer than chunk_size is
+# split further, locally, so memory is bounded by one window plus the longest paragraph.
+# Install dependencies if not already installed: pip install langchain
+
+import re
+from collections import deque
+
+from langchain.schema import Document
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+# --- 1. Reading the Source in Windows ---
+def iter_windows(source, window_size=1 << 20):
+    # source: a whole text (str), an open text file, or any iterable of strings
+    if isinstance(source, str):
+        for start in range(0, len(source), window_size):
+            yield source[start:start + window_size]
+    elif hasattr(source, "read"):
+        for window in iter(lambda: source.read(window_size), ""):
+            yield window
+    else:
+        for window in source:
+            if window:
+                yield window
+
+
+# --- 2. Merging Small Splits into Chunks ---
+class _ChunkMerger:
+    # Incremental version of TextSplitter._merge_splits for the keep_separator case (splits joined with "")
+    def __init__(self, chunk_size, chunk_overlap):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.current = deque()
+        self.total = 0
+
+    def push(self, split):
+        length = len(split)
+        if self.total + length > self.chunk_size and self.current:
+            chunk = "".join(self.current).strip()
+            if chunk:
+                yield chunk
+            # Keep at most chunk_overlap characters of the previous chunk as the start of the next one
+            while self.total > self.chunk_overlap or (
+                self.total + length > self.chunk_size and self.total > 0
+            ):
+                self.total -= len(self.current.popleft())
+        self.current.append(split)
+        self.total += length
+
+    def finish(self):
+        chunk = "".join(self.current).strip()
+        self.current.clear()
+        self.total = 0
+        if chunk:
+            yield chunk
+
+
+# --- 3. Streaming Splitter ---
+class StreamingTextSplitter:
+    def __init__(self, chunk_size=200, chunk_overlap=50, separators=None, window_size=1 << 20):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self.window_size = window_size
+
+    def _iter_pieces(self, windows):
+        # Linear scan for the top-level separator; each piece after the first starts with the separator,
+        # exactly like re.split with the separator kept at the start of the following piece
+        separator = self.separators[0]
+        if separator == "":
+            for window in windows:
+                yield from window
+            return
+        buffer = ""
+        start = 0  # start of the current (unfinished) piece in buffer
+        search_from = 0
+        for window in windows:
+            buffer = buffer[start:] + window
+            search_from -= start
+            start = 0
+            while True:
+                position = buffer.find(separator, search_from)
+                if position == -1:
+                    break
+                if position > start:
+                    yield buffer[start:position]
+                start = position
+                search_from = position + len(separator)
+            # Positions before this one were fully checked; a match may still straddle the next window
+            search_from = max(search_from, len(buffer) - len(separator) + 1)
+        if start < len(buffer):
+            yield buffer[start:]
+
+    def _split_piece(self, text, separators):
+        # Same as RecursiveCharacterTextSplitter._split_text, used only for pieces longer than chunk_size
+        separator = separators[-1]
+        new_separators = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if candidate in text:
+                separator = candidate
+                new_separators = separators[i + 1:]
+                break
+
+        if separator:
+            parts = re.split(f"({re.escape(separator)})", text)
+            splits = [parts[0]] + [parts[i] + parts[i + 1] for i in range(1, len(parts) - 1, 2)]
+        else:
+            splits = list(text)
+
+        merger = _ChunkMerger(self.chunk_size, self.chunk_overlap)
+        for split in splits:
+            if split == "":
+                continue
+            if len(split) < self.chunk_size:
+                yield from merger.push(split)
+            else:
+                yield from merger.finish()
+                if not new_separators:
+                    yield split
+                else:
+                    yield from self._split_piece(split, new_separators)
+        yield from merger.finish()
+
+    def _split_windows(self, windows):
+        merger = _ChunkMerger(self.chunk_size, self.chunk_overlap)
+        for piece in self._iter_pieces(windows):
+            if len(piece) < self.chunk_size:
+                yield from merger.push(piece)
+            else:
+                yield from merger.finish()
+                yield from self._split_piece(piece, self.separators[1:] or [""])
+        yield from merger.finish()
+
+    def split_text(self, source):
+        yield from self._split_windows(iter_windows(source, self.window_size))
+
+    def iter_chunks(self, source):
+        # Yields (start_index, chunk) with the same start_index that add_start_index=True computes:
+        # text.find(chunk, previous_start + len(previous_chunk) - chunk_overlap)
+        history = ""  # text read so far that may still contain the start of a future chunk
+        history_start = 0  # absolute offset of history[0]
+
+        def recorded(windows):
+            nonlocal history
+            for window in windows:
+                history += window
+                yield window
+
+        index = 0
+        previous_chunk_len = 0
+        for chunk in self._split_windows(recorded(iter_windows(source, self.window_size))):
+            offset = max(0, index + previous_chunk_len - self.chunk_overlap, history_start)
+            index = history_start + history.find(chunk, offset - history_start)
+            previous_chunk_len = len(chunk)
+            # Drop text that no later search can reach (with a chunk_size margin for short chunks);
+            # trimming only once half of the history is dead keeps the copying amortized linear
+            keep_from = index - self.chunk_size
+            if keep_from - history_start > len(history) // 2:
+                history = history[keep_from - history_start:]
+                history_start = keep_from
+            yield index, chunk
+
+    def create_documents(self, source, metadata=None):
+        for start_index, chunk in self.iter_chunks(source):
+            yield Document(page_content=chunk, metadata={**(metadata or {}), "start_index": start_index})
+
+    def split_file(self, path, metadata=None, encoding="utf-8"):
+        with open(path, "r", encoding=encoding) as file:
+            yield from self.create_documents(file, {"source": path, **(metadata or {})})
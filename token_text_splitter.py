@@ -0,0 +1,172 @@
+# Token-aware chunking with a cached tokenizer.
+# Character-sized chunks (length_function=len) map to an unpredictable number of tokens, so embedding calls get
+# padded or truncated and batches are billed for tokens that carry no text. TokenTextChunker sizes chunks in
+# tokens of the embedding model's tokenizer instead: whole pages are batch-tokenized once (tiktoken encodes the
+# batch on several threads), chunks are cut on token offsets and sliced out of the original page text, so no
+# chunk is re-tokenized or decoded token by token.
+# Run this file to benchmark it against the character splitter: python token_text_splitter.py [file.txt ...]
+# Install dependencies if not already installed: pip install tiktoken langchain
+
+import statistics
+import sys
+import time
+from functools import lru_cache
+
+import tiktoken
+from langchain.schema import Document
+
+
+# --- 1. Cached Tokenizer ---
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name="cl100k_base"):
+    # Loading BPE ranks is the slow part of tiktoken; do it once per process (and once per pool worker)
+    return tiktoken.get_encoding(encoding_name)
+
+
+def encoding_for_model(model_name):
+    # e.g. "text-embedding-ada-002" / "text-embedding-3-small" -> cl100k_base
+    return get_encoding(tiktoken.encoding_name_for_model(model_name))
+
+
+# --- 2. Cutting Chunks on Token Offsets ---
+def token_windows(token_count, chunk_tokens, overlap_tokens):
+    # (start, end) token ranges of consecutive chunks, each overlapping the previous one by overlap_tokens
+    step = chunk_tokens - overlap_tokens
+    start = 0
+    while start < token_count:
+        end = min(start + chunk_tokens, token_count)
+        yield start, end
+        if end == token_count:
+            break
+        start += step
+
+
+class TokenTextChunker:
+    def __init__(self, chunk_tokens=256, overlap_tokens=32, encoding_name="cl100k_base", num_threads=8):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than chunk_tokens ({chunk_tokens})")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding_name = encoding_name
+        self.num_threads = num_threads
+
+    @property
+    def encoding(self):
+        return get_encoding(self.encoding_name)
+
+    def char_offsets(self, text, tokens, cuts):
+        # Maps sorted token indices to character offsets in text. Only the token runs between consecutive cuts
+        # are decoded (one call each), instead of decoding every token separately.
+        encoded = text.encode("utf-8")
+        offsets = {}
+        previous_cut, token_end, boundary, char_offset = 0, 0, 0, 0
+        for cut in cuts:
+            token_end += len(self.encoding.decode_bytes(tokens[previous_cut:cut]))
+            # A token may end inside a multi-byte character; cut before that character
+            end = token_end
+            while 0 < end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+                end -= 1
+            char_offset += len(encoded[boundary:end].decode("utf-8"))
+            offsets[cut] = char_offset
+            previous_cut, boundary = cut, end
+        return offsets
+
+    def split_page(self, text, tokens):
+        # Yields (start_index, chunk_text, token_count) for one page that is already tokenized
+        if not tokens:
+            return
+        windows = list(token_windows(len(tokens), self.chunk_tokens, self.overlap_tokens))
+        cuts = sorted({cut for window in windows for cut in window})
+        offsets = self.char_offsets(text, tokens, cuts)
+        for start, end in windows:
+            chunk = text[offsets[start]:offsets[end]]
+            if chunk.strip():
+                yield offsets[start], chunk, end - start
+
+    def split_texts(self, texts):
+        # Yields (text_position, start_index, chunk_text, token_count); all texts are tokenized in one batch call
+        texts = list(texts)
+        batch = self.encoding.encode_ordinary_batch(texts, num_threads=self.num_threads)
+        for position, (text, tokens) in enumerate(zip(texts, batch)):
+            for start_index, chunk, token_count in self.split_page(text, tokens):
+                yield position, start_index, chunk, token_count
+
+    def split_documents(self, documents):
+        # Drop-in for text_splitter.split_documents(pages): keeps source/page metadata, adds start_index and tokens
+        documents = list(documents)
+        chunks = []
+        for position, start_index, chunk, token_count in self.split_texts(d.page_content for d in documents):
+            metadata = {**documents[position].metadata, "start_index": start_index, "tokens": token_count}
+            chunks.append(Document(page_content=chunk, metadata=metadata))
+        return chunks
+
+    def create_documents(self, texts, metadatas=None):
+        documents = [
+            Document(page_content=text, metadata=(metadatas[i] if metadatas else {}))
+            for i, text in enumerate(texts)
+        ]
+        return self.split_documents(documents)
+
+
+# --- 3. Benchmark: Token Chunker vs. Character Splitter ---
+def batch_utilization(token_counts, batch_size=32, max_tokens=512):
+    # Share of padded batch slots (batch_size x longest input, capped at the model's max_tokens) that hold real
+    # tokens, plus the share of chunks that the model would truncate
+    useful, padded = 0, 0
+    for start in range(0, len(token_counts), batch_size):
+        batch = [min(count, max_tokens) for count in token_counts[start:start + batch_size]]
+        useful += sum(batch)
+        padded += len(batch) * max(batch)
+    truncated = sum(count > max_tokens for count in token_counts)
+    return useful / padded if padded else 0.0, truncated / len(token_counts) if token_counts else 0.0
+
+
+def run_benchmark(pages, chunk_tokens=256, overlap_tokens=32, batch_size=32, max_tokens=256):
+    from streaming_text_splitter import StreamingTextSplitter
+
+    encoding = get_encoding()
+    megabytes = sum(len(page.encode("utf-8")) for page in pages) / 1e6
+
+    start = time.perf_counter()
+    char_splitter = StreamingTextSplitter(chunk_size=200, chunk_overlap=50)
+    char_chunks = [chunk for page in pages for chunk in char_splitter.split_text(page)]
+    char_seconds = time.perf_counter() - start
+    char_tokens = [len(tokens) for tokens in encoding.encode_ordinary_batch(char_chunks)]
+
+    encoding.encode_ordinary("warm up")  # tokenizer load is not part of the measurement
+    start = time.perf_counter()
+    token_chunker = TokenTextChunker(chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    token_chunks = list(token_chunker.split_texts(pages))
+    token_seconds = time.perf_counter() - start
+    token_tokens = [token_count for _, _, _, token_count in token_chunks]
+
+    print(f"Input: {len(pages)} pages, {megabytes:.1f} MB")
+    print(f"{'splitter':<24}{'MB/s':>8}{'chunks':>9}{'tok/chunk':>11}{'stdev':>8}{'util':>7}{'trunc':>7}")
+    for name, seconds, counts in (
+        ("characters (200/50)", char_seconds, char_tokens),
+        (f"tokens ({chunk_tokens}/{overlap_tokens})", token_seconds, token_tokens),
+    ):
+        utilization, truncated = batch_utilization(counts, batch_size, max_tokens)
+        print(
+            f"{name:<24}{megabytes / seconds:>8.1f}{len(counts):>9}{statistics.mean(counts):>11.1f}"
+            f"{statistics.pstdev(counts):>8.1f}{utilization:>7.0%}{truncated:>7.0%}"
+        )
+    print(f"Embedding inputs needed for the same text: {len(char_tokens)} vs {len(token_tokens)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, "r", encoding="utf-8") as file:
+                pages.extend(page for page in file.read().split("\f") if page.strip())
+    else:
+        sample = (
+            "Artificial Intelligence (AI) refers to the simulation of human intelligence in machines.\n"
+            "Machines are programmed to think and learn like humans, performing tasks such as problem-solving,\n"
+            "decision-making, and pattern recognition.\n\n"
+            "- Healthcare: AI helps in diagnosing diseases and personalizing treatments.\n"
+            "- Finance: AI detects fraud and automates trading.\n\n"
+        )
+        pages = [sample * 40 for _ in range(500)]
+    run_benchmark(pages)
@@ -0,0 +1,361 @@
+# Non-blocking, batched export of Langfuse traces.
+# langfuse.trace(...) after every transcription puts the observability backend on the request path. TraceExporter
+# takes traces off it:
+#   - export() / trace() only put the trace in a bounded in-memory queue and return,
+#   - a background thread collects up to batch_size traces (or what arrived within flush_interval seconds) and sends
+#     them in one request to Langfuse's batch ingestion endpoint, retrying with backoff,
+#   - under backpressure (queue full, or the backend down after the retries) traces are dropped, or with
+#     overflow="spill" appended to a JSONL file (capped at max_spill_bytes) and re-sent once the backend is back,
+#   - start_trace() records per-stage spans (load, inference, post-processing, ...) with their timings.
+# Traces keep their IDs across retries and spills, so a batch that is sent twice updates the same trace.
+# FakeCollector is a local stand-in for the ingestion endpoint, enough to run everything without a Langfuse server:
+#     python trace_exporter.py      request-path latency inline vs. exported, and a collector outage with spilling
+# Install dependencies if not already installed: none (standard library only)
+
+import atexit
+import base64
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# --- 1. Traces with Per-Stage Spans ---
+class Trace:
+    def __init__(self, exporter, name, input=None, metadata=None):
+        self.exporter = exporter
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.input = input
+        self.output = None
+        self.metadata = dict(metadata or {})
+        self.start_time = utc_now()
+        self.spans = []
+
+    @contextmanager
+    def span(self, name, **metadata):
+        # with trace.span("inference"): ...  -> a span with start/end time and duration_ms
+        start_time, start = utc_now(), time.perf_counter()
+        try:
+            yield
+        finally:
+            metadata["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            self.spans.append(
+                {"id": uuid.uuid4().hex, "name": name, "start_time": start_time, "end_time": utc_now(),
+                 "metadata": metadata}
+            )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "input": self.input,
+            "output": self.output,
+            "metadata": self.metadata,
+            "start_time": self.start_time,
+            "end_time": utc_now(),
+            "spans": self.spans,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.metadata["error"] = f"{exc_type.__name__}: {exc}"
+        self.exporter.export(self.to_dict())
+        return False
+
+
+# --- 2. Background Exporter ---
+class TraceExporter:
+    def __init__(self, sender, max_queue=10_000, batch_size=100, flush_interval=1.0, overflow="drop",
+                 spill_path="trace_spill.jsonl", max_spill_bytes=256 << 20, max_retries=3, retry_after=30.0):
+        # sender(traces) sends one batch (list of trace dicts) or raises; overflow: "drop" or "spill"
+        if overflow not in ("drop", "spill"):
+            raise ValueError(f"Unknown overflow {overflow!r}, expected 'drop' or 'spill'")
+        self.sender = sender
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.max_spill_bytes = max_spill_bytes
+        self.max_retries = max_retries
+        self.retry_after = retry_after  # seconds between attempts to re-send spilled traces after a failure
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"exported": 0, "batches": 0, "rejected": 0, "dropped": 0, "spilled": 0, "failed_batches": 0}
+        self._spill_lock = threading.Lock()  # also guards stats, updated by caller threads and the sender thread
+        self._last_failure = float("-inf")
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def start_trace(self, name, input=None, metadata=None):
+        # with exporter.start_trace("transcription", input=audio) as trace: ... trace.output = text
+        return Trace(self, name, input, metadata)
+
+    def trace(self, name, input=None, output=None, metadata=None):
+        # Drop-in for langfuse.trace(name=..., input=..., output=..., metadata=...) that does not block
+        with self.start_trace(name, input, metadata) as trace:
+            trace.output = output
+
+    def export(self, trace):
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self._overflow([trace])
+
+    def _overflow(self, traces):
+        if self.overflow == "spill" and self._spill(traces):
+            return
+        self._count("dropped", len(traces))
+
+    def _count(self, name, amount=1):
+        with self._spill_lock:
+            self.stats[name] += amount
+
+    def _spill(self, traces):
+        lines = "".join(json.dumps(trace, default=str) + "\n" for trace in traces)
+        with self._spill_lock:
+            size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+            if size + len(lines) > self.max_spill_bytes:
+                return False
+            with open(self.spill_path, "a", encoding="utf-8") as file:
+                file.write(lines)
+            self.stats["spilled"] += len(traces)
+        return True
+
+    def _next_batch(self):
+        # Up to batch_size traces, waiting at most flush_interval after the first; a flush marker ends the batch
+        try:
+            first = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return [], []
+        batch, markers = [], []
+        deadline = time.monotonic() + self.flush_interval
+        item = first
+        while True:
+            if isinstance(item, threading.Event):
+                markers.append(item)
+                break
+            if item is not None:
+                batch.append(item)
+            if item is None or len(batch) >= self.batch_size:
+                break
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+        return batch, markers
+
+    def _send(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                rejected = self.sender(batch) or 0
+                with self._spill_lock:
+                    self.stats["rejected"] += rejected
+                    self.stats["exported"] += len(batch)
+                    self.stats["batches"] += 1
+                return True
+            except Exception:
+                if attempt < self.max_retries and not self._closed:
+                    time.sleep(min(0.5 * 2 ** attempt, 10.0))
+        self._last_failure = time.monotonic()
+        self._count("failed_batches")
+        self._overflow(batch)
+        return False
+
+    def _replay_spill(self):
+        # Re-sends spilled traces when idle, unless the backend failed within the last retry_after seconds
+        if time.monotonic() - self._last_failure < self.retry_after:
+            return
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            replay_path = self.spill_path + ".replay"
+            os.replace(self.spill_path, replay_path)
+        with open(replay_path, "r", encoding="utf-8") as file:
+            traces = [json.loads(line) for line in file if line.strip()]
+        os.remove(replay_path)
+        self._count("spilled", -len(traces))
+        for start in range(0, len(traces), self.batch_size):
+            if not self._send(traces[start:start + self.batch_size]):
+                self._overflow(traces[start + self.batch_size:])
+                break
+
+    def _run(self):
+        while True:
+            batch, markers = self._next_batch()
+            if batch:
+                self._send(batch)
+            elif self.overflow == "spill" and not self._closed:
+                self._replay_spill()
+            for marker in markers:
+                marker.set()
+            if self._closed and self.queue.empty():
+                break
+
+    def flush(self, timeout=10.0):
+        # Waits until everything exported before this call has been sent (or dropped / spilled)
+        marker = threading.Event()
+        try:
+            self.queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def close(self, timeout=10.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        try:
+            self.queue.put(None, timeout=timeout)  # wakes the thread
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+
+# --- 3. Langfuse Batch Ingestion ---
+def ingestion_events(trace):
+    # One trace-create event and one span-create event per span; event IDs derive from the trace and span IDs
+    events = [{
+        "id": f"{trace['id']}-trace",
+        "type": "trace-create",
+        "timestamp": trace["start_time"],
+        "body": {key: trace[key] for key in ("id", "name", "input", "output", "metadata")} | {
+            "timestamp": trace["start_time"]
+        },
+    }]
+    for span in trace["spans"]:
+        events.append({
+            "id": f"{span['id']}-span",
+            "type": "span-create",
+            "timestamp": span["start_time"],
+            "body": {
+                "id": span["id"],
+                "traceId": trace["id"],
+                "name": span["name"],
+                "startTime": span["start_time"],
+                "endTime": span["end_time"],
+                "metadata": span["metadata"],
+            },
+        })
+    return events
+
+
+class LangfuseSender:
+    # POSTs a batch of traces to /api/public/ingestion; keys and host default to the Langfuse environment variables
+    def __init__(self, host=None, public_key=None, secret_key=None, timeout=10.0):
+        host = host or os.environ.get("LANGFUSE_HOST", "https://cloud.langfuse.com")
+        public_key = public_key or os.environ.get("LANGFUSE_PUBLIC_KEY", "")
+        secret_key = secret_key or os.environ.get("LANGFUSE_SECRET_KEY", "")
+        self.url = host.rstrip("/") + "/api/public/ingestion"
+        self.timeout = timeout
+        token = base64.b64encode(f"{public_key}:{secret_key}".encode("utf-8")).decode("ascii")
+        self.headers = {"Authorization": f"Basic {token}", "Content-Type": "application/json"}
+
+    def __call__(self, traces):
+        # Returns the number of events the backend rejected (invalid events are not retried)
+        events = [event for trace in traces for event in ingestion_events(trace)]
+        body = json.dumps({"batch": events}, default=str).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            result = json.loads(response.read() or b"{}")
+        return len(result.get("errors", []))
+
+
+# --- 4. Fake Collector for Local Runs ---
+class FakeCollector:
+    # Local stand-in for the ingestion endpoint: records every batch; delay simulates a slow backend and
+    # available=False an outage (HTTP 503)
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.available = True
+        self.batches = []
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                time.sleep(collector.delay)
+                if not collector.available:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                collector.batches.append(payload["batch"])
+                body = json.dumps({"successes": [{"id": event["id"], "status": 201} for event in payload["batch"]],
+                                   "errors": []}).encode("utf-8")
+                self.send_response(207)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def events(self, event_type=None):
+        return [event for batch in self.batches for event in batch if event_type in (None, event["type"])]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    def p99(values):
+        return sorted(values)[int(len(values) * 0.99) - 1] * 1000
+
+    fake = FakeCollector(delay=0.05)  # 50 ms per request, like a remote backend
+    sender = LangfuseSender(fake.host, "pk-lf-local", "sk-lf-local")
+    traces = 200
+
+    inline = []
+    for number in range(traces):
+        start = time.perf_counter()
+        sender([{"id": uuid.uuid4().hex, "name": "inline", "input": number, "output": None, "metadata": {},
+                 "start_time": utc_now(), "end_time": utc_now(), "spans": []}])
+        inline.append(time.perf_counter() - start)
+
+    exporter = TraceExporter(sender, batch_size=100, flush_interval=0.2)
+    exported = []
+    for number in range(traces):
+        start = time.perf_counter()
+        with exporter.start_trace("exported", input=number) as trace:
+            with trace.span("inference"):
+                trace.output = number * 2
+        exported.append(time.perf_counter() - start)
+    exporter.flush()
+    print(f"inline:   p99 {p99(inline):7.2f} ms on the request path, {traces} requests")
+    print(f"exporter: p99 {p99(exported):7.2f} ms on the request path, {exporter.stats['batches']} requests")
+    exporter.close()
+
+    fake.available = False
+    spilling = TraceExporter(sender, max_queue=50, batch_size=50, flush_interval=0.1, overflow="spill",
+                             spill_path="trace_spill_demo.jsonl", max_retries=1, retry_after=0.5)
+    for number in range(100):
+        spilling.trace("during_outage", input=number)
+    spilling.flush()
+    print("during the outage:", spilling.stats)
+    fake.available = True
+    time.sleep(1.0)
+    spilling.flush()
+    print("after recovery:   ", spilling.stats)
+    spilling.close()
+    fake.close()
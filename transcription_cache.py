@@ -0,0 +1,182 @@
+# Persistent cache of Whisper results, keyed by what determines the output.
+# The same recordings are transcribed and translated again and again (audio_to_text.py, nightly reruns), and each
+# call costs the full model time. TranscriptionCache stores the result ({"text", "chunks", ...}, zstd compressed)
+# in a SQLite file keyed by
+#   - the SHA-256 of the audio file content: a renamed or copied recording is still a hit,
+#   - the model ID (pipe.model.name_or_path),
+#   - the normalized generate_kwargs: key order, None values, defaults and the spelling of the language
+#     ("english", "English", "en") do not change the key; task "transcribe" vs "translate" does,
+#   - the transcription mode and its options (plain pipeline, long-form windows, VAD), which shape the chunks.
+# Hits return instantly; the cache is capped in bytes and evicts least recently used results.
+#     python transcription_cache.py prune --max-mb 256
+#     python transcription_cache.py stats
+# Install dependencies if not already installed: pip install zstandard (optional, zlib otherwise)
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from functools import lru_cache
+
+from file_utils import compress, decompress, file_hash
+
+try:
+    from transformers.models.whisper.tokenization_whisper import LANGUAGES, TO_LANGUAGE_CODE
+except ImportError:  # only the language spelling is normalized with it
+    LANGUAGES, TO_LANGUAGE_CODE = {}, {}
+
+GENERATE_DEFAULTS = {"task": "transcribe"}
+
+
+# --- 1. Keys ---
+def model_id(pipe):
+    model = getattr(pipe, "model", None)
+    return getattr(model, "name_or_path", None) or getattr(getattr(model, "config", None), "_name_or_path", "unknown")
+
+
+def normalize_language(language):
+    language = language.strip().lower().removeprefix("<|").removesuffix("|>")
+    if language in LANGUAGES:
+        return language
+    return TO_LANGUAGE_CODE.get(language, language)
+
+
+def normalize_generate_kwargs(generate_kwargs):
+    # Canonical JSON of the generation options that change the output. Only the spelling of language and task is
+    # normalized; other values (e.g. prompt text) are case-sensitive and kept as given
+    normalized = dict(GENERATE_DEFAULTS)
+    for name, value in (generate_kwargs or {}).items():
+        if value is None:
+            continue
+        if name == "language":
+            value = normalize_language(value)
+        elif name == "task":
+            value = value.strip().lower()
+        normalized[name] = value
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+def result_key(content_hash, model, generate_kwargs=None, mode="pipeline", options=None):
+    # mode/options: how the file was transcribed (e.g. "long_form" with window_s, "vad" with vad="energy")
+    parts = [content_hash, model, normalize_generate_kwargs(generate_kwargs), mode,
+             json.dumps(options or {}, sort_keys=True, default=str)]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+# --- 2. SQLite-Backed Cache with Size-Capped LRU Eviction ---
+class TranscriptionCache:
+    def __init__(self, path="transcription_cache.sqlite", max_bytes=1 << 30, level=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.level = level
+        self.hits = 0
+        self.misses = 0
+        # WAL lets the transcription service's worker processes share the cache
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, bytes INTEGER NOT NULL, codec TEXT NOT NULL, "
+            "last_used REAL NOT NULL, data BLOB NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.connection.commit()
+
+    def get(self, key):
+        # The stored result (timestamps come back as lists), or None on a miss
+        row = self.connection.execute("SELECT codec, data FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        with self.connection:
+            self.connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return json.loads(decompress(row[0], row[1]))
+
+    def put(self, key, model, result):
+        codec, blob = compress(json.dumps(result, ensure_ascii=False).encode("utf-8"), self.level)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (key, model, bytes, codec, last_used, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, len(blob), codec, time.time(), blob),
+            )
+        self.evict()
+
+    def size(self):
+        return self.connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM results").fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        # Drops least recently used results until the cache is at most max_bytes; returns how many were dropped
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        excess = self.size() - max_bytes
+        if excess <= 0:
+            return 0
+        victims, freed = [], 0
+        for key, size in self.connection.execute("SELECT key, bytes FROM results ORDER BY last_used"):
+            if freed >= excess:
+                break
+            victims.append((key,))
+            freed += size
+        with self.connection:
+            self.connection.executemany("DELETE FROM results WHERE key = ?", victims)
+        return len(victims)
+
+    def stats(self):
+        results, size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM results"
+        ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "results": results,
+            "megabytes": size / 1e6,
+        }
+
+    def close(self):
+        self.connection.close()
+
+
+@lru_cache(maxsize=None)
+def open_transcription_cache(path="transcription_cache.sqlite"):
+    # One connection per process (and per worker), reused across files
+    return TranscriptionCache(path)
+
+
+# --- 3. Cached Transcription ---
+def cached_transcribe(cache, pipe, path, generate_kwargs=None, transcribe=None, mode="pipeline", **options):
+    # pipe(path, generate_kwargs=...) or transcribe(pipe, path, generate_kwargs=..., **options), computed once
+    # per (audio content, model, generate_kwargs, mode, options)
+    key = result_key(file_hash(path), model_id(pipe), generate_kwargs, mode, options)
+    result = cache.get(key)
+    if result is None:
+        if transcribe is None:
+            result = pipe(path, generate_kwargs=generate_kwargs, **options)
+        else:
+            result = transcribe(pipe, path, generate_kwargs=generate_kwargs, **options)
+        cache.put(key, model_id(pipe), result)
+    return result
+
+
+# --- 4. Command Line: prune / stats ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache of Whisper transcription results")
+    parser.add_argument("--cache", default="transcription_cache.sqlite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prune = commands.add_parser("prune", help="evict least recently used results down to a size")
+    prune.add_argument("--max-mb", type=float, required=True)
+    commands.add_parser("stats", help="print the cache size")
+    args = parser.parse_args(argv)
+
+    cache = TranscriptionCache(args.cache)
+    if args.command == "prune":
+        print(f"Evicted {cache.evict(int(args.max_mb * 1e6))} results")
+    print(cache.stats())
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# Directory-scale transcription: a pool of worker processes, each loading the Whisper model once.
+# Building pipeline("automatic-speech-recognition", model="openai/whisper-large-v3") reloads gigabytes of weights,
+# and the examples did it once per script section. Here
+#   - load_asr_pipeline() caches one pipeline per (model, device) and process, so scripts can share it,
+#   - TranscriptionService starts num_workers processes that load the model once and then take audio paths from
+#     a work queue, one file at a time; every file goes through the long-form mode (long_audio_transcriber.py),
+#   - results (text plus timestamp chunks, or the error) are appended to a JSONL file as they complete, by the
+#     parent process only, so lines never interleave,
+#   - a rerun with the same output file resumes: files that already have a successful record are skipped, failed
+#     ones are retried, and a line torn by a crash is cut off first. A worker that dies (e.g. out of memory on one
+#     call) is replaced and its file is recorded as failed.
+#   - with vad="energy" or "webrtc" only the speech is transcribed (voice_activity.py) and every record also has
+#     duration, speech_seconds and skipped_seconds,
+#   - with cache_path, files already transcribed with the same model and options (in any directory, under any
+#     name) come from the result cache (transcription_cache.py) and are marked "cached".
+#     python transcription_service.py ./calls transcripts.jsonl --workers 4 --model openai/whisper-large-v3
+#     python transcription_service.py ./calls transcripts.jsonl --vad webrtc --cache transcription_cache.sqlite
+# Install dependencies if not already installed: pip install transformers torch soundfile
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from functools import lru_cache, partial
+from multiprocessing.connection import wait
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".m4a")
+
+
+# --- 1. One Pipeline per Process ---
+@lru_cache(maxsize=None)
+def load_asr_pipeline(model_name="openai/whisper-large-v3", device=None):
+    import torch
+    from transformers import pipeline
+
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    return pipeline("automatic-speech-recognition", model=model_name, device=device)
+
+
+def list_audio(directory, extensions=AUDIO_EXTENSIONS):
+    paths = []
+    for root, _, names in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in names if name.lower().endswith(extensions))
+    return sorted(paths)
+
+
+# --- 2. Resumable JSONL Output ---
+def completed_paths(output_path):
+    # Paths with a successful record. Unparsable lines are skipped, the records after them still count; only a
+    # torn last line (crash mid-write, no newline) is truncated so appends stay valid JSONL.
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    valid_bytes = 0
+    with open(output_path, "rb") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            valid_bytes += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in record:
+                done.add(record["path"])
+    if valid_bytes != os.path.getsize(output_path):
+        with open(output_path, "r+b") as file:
+            file.truncate(valid_bytes)
+    return done
+
+
+# --- 3. Worker Process ---
+def transcribe_worker(tasks, results, model_name, device, threads, batch_size, generate_kwargs, vad=None,
+                      cache_path=None):
+    # Loads the model once, then receives paths until None and sends one record per path
+    import torch
+
+    from long_audio_transcriber import transcribe_file
+    from transcription_cache import TranscriptionCache, cached_transcribe
+    from voice_activity import transcribe_speech
+
+    torch.set_num_threads(threads)  # workers split the cores instead of oversubscribing them
+    pipe = load_asr_pipeline(model_name, device)
+    cache = TranscriptionCache(cache_path) if cache_path else None
+    if vad:
+        transcribe, mode, options = partial(transcribe_speech, batch_size=batch_size), "vad", {"vad": vad}
+    else:
+        transcribe, mode, options = partial(transcribe_file, batch_size=batch_size), "long_form", {}
+    while True:
+        path = tasks.recv()
+        if path is None:
+            break
+        start = time.perf_counter()
+        try:
+            if cache:
+                hits = cache.hits
+                result = cached_transcribe(cache, pipe, path, generate_kwargs, transcribe, mode, **options)
+                result["cached"] = cache.hits > hits
+            else:
+                result = transcribe(pipe, path, generate_kwargs=generate_kwargs, **options)
+            record = {"path": path, **result}
+        except Exception as error:
+            record = {"path": path, "error": f"{type(error).__name__}: {error}"}
+        record.update({"model": model_name, "seconds": round(time.perf_counter() - start, 2)})
+        results.send(record)
+    if cache:
+        cache.close()
+
+
+class _Worker:
+    def __init__(self, context, args):
+        task_reader, self.tasks = context.Pipe(duplex=False)
+        self.results, result_writer = context.Pipe(duplex=False)
+        self.process = context.Process(target=transcribe_worker, args=(task_reader, result_writer, *args), daemon=True)
+        self.process.start()
+        task_reader.close()
+        result_writer.close()
+        self.path = None
+
+    def assign(self, path):
+        self.path = path
+        self.tasks.send(path)
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.tasks.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(timeout=30)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.tasks.close()
+        self.results.close()
+
+
+# --- 4. Transcription Service ---
+class TranscriptionService:
+    def __init__(self, model_name="openai/whisper-large-v3", device="cpu", num_workers=2, batch_size=8,
+                 generate_kwargs=None, vad=None, cache_path=None):
+        # vad: None, "energy" or "webrtc" to transcribe only the speech of every file (see voice_activity.py);
+        # cache_path: optional result cache (transcription_cache.py), e.g. "transcription_cache.sqlite"
+        self.model_name = model_name
+        self.device = device
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.generate_kwargs = generate_kwargs or {"task": "transcribe", "language": "english"}
+        self.vad = vad
+        self.cache_path = cache_path
+        self.threads = max(1, (os.cpu_count() or 1) // num_workers)
+        # spawn: CUDA and torch's thread pools do not survive fork
+        self.context = multiprocessing.get_context("spawn")
+        self.stats = {"transcribed": 0, "failed": 0, "skipped": 0, "cached": 0, "silence_seconds": 0.0}
+
+    def _start_worker(self):
+        args = (self.model_name, self.device, self.threads, self.batch_size, self.generate_kwargs, self.vad,
+                self.cache_path)
+        return _Worker(self.context, args)
+
+    def run(self, paths, output_path):
+        # The work queue is the list of pending paths; an idle worker gets the next one as soon as it reports.
+        # Each worker has its own pipes, so the parent always knows which file a worker that died was holding.
+        done = completed_paths(output_path)
+        pending = iter([path for path in paths if path not in done])
+        self.stats["skipped"] = len(done)
+        if self.cache_path:
+            from transcription_cache import TranscriptionCache
+
+            TranscriptionCache(self.cache_path).close()  # create the schema before the workers start
+        workers = [self._start_worker() for _ in range(self.num_workers)]
+        with open(output_path, "a", encoding="utf-8") as output:
+            def write(record):
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                self.stats["failed" if "error" in record else "transcribed"] += 1
+                self.stats["cached"] += record.get("cached", False)
+                self.stats["silence_seconds"] += record.get("skipped_seconds", 0.0)
+
+            def assign_next(worker):
+                path = next(pending, None)
+                worker.path = None
+                if path is not None:
+                    worker.assign(path)
+
+            try:
+                for worker in workers:
+                    assign_next(worker)
+                while any(worker.path is not None for worker in workers):
+                    busy = {worker.results: worker for worker in workers if worker.path is not None}
+                    for connection in wait(list(busy)):
+                        worker = busy[connection]
+                        try:
+                            record = connection.recv()
+                        except EOFError:  # the worker died (e.g. out of memory): record the file, start a new one
+                            worker.process.join(timeout=5)
+                            write({"path": worker.path, "error": f"worker exited with code {worker.process.exitcode}"})
+                            worker.stop(kill=True)
+                            position = workers.index(worker)
+                            worker = workers[position] = self._start_worker()
+                        else:
+                            write(record)
+                        assign_next(worker)
+                    finished = self.stats["transcribed"] + self.stats["failed"]
+                    if finished and finished % 100 == 0:
+                        print(f"{finished} files, {self.stats}")
+            finally:
+                for worker in workers:
+                    worker.stop(kill=worker.path is not None)
+        print(f"Transcription finished: {self.stats}")
+        return self.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe a directory of audio files to JSONL")
+    parser.add_argument("directory")
+    parser.add_argument("output", help="JSONL file; rerunning with the same file resumes")
+    parser.add_argument("--model", default="openai/whisper-large-v3")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--vad", choices=("energy", "webrtc"), default=None, help="skip silence before the model")
+    parser.add_argument("--cache", default=None, help="result cache file, e.g. transcription_cache.sqlite")
+    args = parser.parse_args(argv)
+    service = TranscriptionService(
+        args.model,
+        args.device,
+        args.workers,
+        args.batch_size,
+        {"task": "transcribe", "language": args.language},
+        args.vad,
+        args.cache,
+    )
+    service.run(list_audio(args.directory), args.output)
+
+
+if __name__ == "__main__":
+    main()